@@ -0,0 +1,282 @@
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from .csv_stream import CSV_CHUNK_ROWS, MissingColumnsError, iter_csv_chunks, read_header
+from ..services.response_cache import TTLCache
+
+METHODS = ("threshold", "zscore", "iqr", "ewma")
+# Default cut-offs: standard deviations for zscore and ewma, IQRs beyond the quartiles for iqr
+DEFAULT_SENSITIVITY = {"zscore": 3.0, "ewma": 3.0, "iqr": 1.5}
+
+# Window values gathered at once when scoring zscore and iqr, to bound memory for large windows
+WINDOW_BLOCK_VALUES = 4 * 1024 * 1024
+
+# Detector state of incremental streams, kept by the API process between requests
+ANOMALY_STREAM_STATES = int(os.getenv("ANOMALY_STREAM_STATES", "256"))
+ANOMALY_STREAM_TTL_SECONDS = float(os.getenv("ANOMALY_STREAM_TTL_SECONDS", "86400"))
+stream_states = TTLCache(max_size=ANOMALY_STREAM_STATES, ttl=ANOMALY_STREAM_TTL_SECONDS)
+
+
+class DetectorState:
+    """
+    What a detector carries from one chunk of rows to the next: the last
+    `window` values of each group (zscore, iqr) or each group's running
+    averages (ewma). Kept between requests, it lets newly appended rows be
+    scored without re-reading the history.
+
+    Every value is scored against the history before it, and only once a
+    group has `window` earlier values.
+    """
+
+    def __init__(self, method: str, kpi_column: str, group_by: str = None, window: int = 30,
+                 sensitivity: float = None, threshold: float = None):
+        self.method = method
+        self.window = window
+        self.sensitivity = DEFAULT_SENSITIVITY.get(method) if sensitivity is None else sensitivity
+        self.threshold = threshold
+        self.settings = (method, kpi_column, group_by, window, self.sensitivity, threshold)
+        self.rows_seen = 0
+        # zscore and iqr: the trailing window of each group
+        self.keys = np.empty(0, dtype=object)
+        self.values = np.empty(0)
+        # ewma: mean, mean of squares and number of values so far, indexed by group
+        self.averages = pd.DataFrame({"mean": [], "square": [], "count": []})
+
+    def score(self, keys: np.ndarray, values: np.ndarray):
+        """
+        Returns (expected, severity) arrays for the given values, which follow
+        everything seen so far. Severity is signed (negative for drops) and is
+        NaN for values that can't be scored yet.
+        """
+        if self.method == "threshold":
+            return np.full(len(values), self.threshold), values - self.threshold
+        if self.method == "ewma":
+            return self._score_ewma(keys, values)
+        return self._score_window(keys, values)
+
+    def is_anomaly(self, severity: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            if self.method == "threshold":
+                return severity > 0
+            return np.abs(severity) > self.sensitivity
+
+    def _score_window(self, keys, values):
+        history = len(self.values)
+        all_keys = np.concatenate([self.keys, keys.astype(object)])
+        layout = _GroupLayout(all_keys)
+        ordered = np.concatenate([self.values, values])[layout.order]
+        low = np.full(len(ordered), np.nan)
+        high = np.full(len(ordered), np.nan)
+
+        # New rows with a full window of earlier values in their group; since rows
+        # are sorted by group, that window is the `window` values just before the row
+        rows = np.flatnonzero(layout.position >= self.window)
+        rows = rows[layout.order[rows] >= history]
+        windows = sliding_window_view(ordered, self.window)
+        block = max(1, WINDOW_BLOCK_VALUES // self.window)
+        for first in range(0, len(rows), block):
+            batch = rows[first:first + block]
+            values_before = windows[batch - self.window]
+            if self.method == "zscore":
+                low[batch] = values_before.mean(axis=1)
+                high[batch] = values_before.std(axis=1, ddof=1)
+            else:
+                low[batch], high[batch] = np.percentile(values_before, [25, 75], axis=1)
+
+        # Keep the last `window` values of each group for the next chunk
+        tail = layout.position >= np.repeat(layout.sizes - self.window, layout.sizes)
+        self.keys = all_keys[layout.order][tail]
+        self.values = ordered[tail]
+
+        low = layout.unsort(low)[history:]
+        high = layout.unsort(high)[history:]
+        if self.method == "zscore":
+            return low, (values - low) / _floor(high, low)
+        expected = (low + high) / 2
+        spread = _floor(high - low, expected)
+        with np.errstate(invalid="ignore"):
+            severity = np.where(values > high, (values - high) / spread, np.where(values < low, (values - low) / spread, 0.0))
+        severity[np.isnan(low)] = np.nan
+        return expected, severity
+
+    def _score_ewma(self, keys, values):
+        alpha = 2 / (self.window + 1)
+        layout = _GroupLayout(keys.astype(object))
+        ordered = values[layout.order]
+        group_keys = layout.group_keys
+        saved = self.averages.reindex(group_keys)
+        is_new = saved["mean"].isna().to_numpy()
+        first = ordered[layout.starts]
+
+        # Groups seen before carry on from their saved averages; new ones start at their first value
+        mean = _smooth(ordered, np.where(is_new, first, saved["mean"].to_numpy()), layout, alpha)
+        square = _smooth(ordered * ordered, np.where(is_new, first * first, saved["square"].to_numpy()), layout, alpha)
+
+        # Each value is compared with the averages just before it
+        previous_mean = np.r_[np.nan, mean[:-1]]
+        previous_square = np.r_[np.nan, square[:-1]]
+        previous_mean[layout.starts] = np.where(is_new, np.nan, saved["mean"].to_numpy())
+        previous_square[layout.starts] = np.where(is_new, np.nan, saved["square"].to_numpy())
+        seen_before = saved["count"].fillna(0).to_numpy()
+        warm = np.repeat(seen_before, layout.sizes) + layout.position >= self.window
+
+        spread = np.sqrt(np.maximum(previous_square - previous_mean * previous_mean, 0.0))
+        with np.errstate(invalid="ignore"):
+            severity = np.where(warm, (ordered - previous_mean) / _floor(spread, previous_mean), np.nan)
+
+        last = layout.starts + layout.sizes - 1
+        latest = pd.DataFrame(
+            {"mean": mean[last], "square": square[last], "count": seen_before + layout.sizes},
+            index=pd.Index(group_keys, dtype=object),
+        )
+        self.averages = pd.concat([self.averages.drop(group_keys, errors="ignore"), latest])
+        return layout.unsort(previous_mean), layout.unsort(severity)
+
+
+class _GroupLayout:
+    """Rows sorted by group (keeping their order within each group), with each row's position in its group."""
+
+    def __init__(self, keys: np.ndarray):
+        codes, uniques = pd.factorize(keys)
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else np.empty(0, dtype=np.int64)
+        self.sizes = np.diff(np.r_[self.starts, len(codes)])
+        self.position = np.arange(len(codes)) - np.repeat(self.starts, self.sizes)
+        self.group_keys = np.asarray(uniques, dtype=object)[sorted_codes[self.starts]]
+
+    def unsort(self, values: np.ndarray) -> np.ndarray:
+        """Puts values computed in sorted order back into the original row order."""
+        result = np.empty_like(values)
+        result[self.order] = values
+        return result
+
+
+def _smooth(values, seeds, layout: _GroupLayout, alpha: float) -> np.ndarray:
+    """
+    Exponentially weighted moving average of each group, starting from its
+    seed: y = alpha * x + (1 - alpha) * y_before. All groups go through one
+    filter pass; the filter is linear, so each group's start is then corrected
+    for what it inherited from the group before it.
+    """
+    # scipy.signal takes about a second to import, so it is only loaded when EWMA is used
+    from scipy.signal import lfilter
+
+    decay = 1 - alpha
+    smoothed = lfilter([alpha], [1, -decay], values)
+    inherited = np.r_[0.0, smoothed][layout.starts]
+    return smoothed + np.repeat(seeds - inherited, layout.sizes) * decay ** (layout.position + 1)
+
+
+def _floor(spread, center):
+    # A window with no variation would divide by zero; a tiny floor still ranks any change as severe
+    return np.maximum(spread, 1e-9 * np.maximum(np.abs(center), 1.0))
+
+
+class AnomalyCollector:
+    """
+    Counts every anomaly but keeps only the rows needed for the requested
+    page, ordered by severity (largest first) or by position in the data.
+    """
+
+    def __init__(self, limit: int, offset: int = 0, order: str = "severity"):
+        self.limit = limit
+        self.offset = offset
+        self.order = order
+        self.count = 0
+        self.kept = None
+
+    def add(self, rows: pd.DataFrame):
+        self.count += len(rows)
+        if rows.empty:
+            return
+        needed = self.offset + self.limit
+        if self.kept is None:
+            combined = rows
+        elif self.order == "row" and len(self.kept) >= needed:
+            return
+        else:
+            combined = pd.concat([self.kept, rows])
+        if self.order == "row":
+            self.kept = combined.head(needed)
+        else:
+            self.kept = combined.loc[combined["severity"].abs().nlargest(needed, keep="first").index]
+
+    def page(self) -> pd.DataFrame:
+        if self.kept is None:
+            return pd.DataFrame()
+        return self.kept.iloc[self.offset:self.offset + self.limit]
+
+
+def detect_anomalies(
+    source,
+    kpi_column: str,
+    method: str = "threshold",
+    group_by: str = None,
+    window: int = 30,
+    sensitivity: float = None,
+    threshold: float = None,
+    limit: int = 1000,
+    offset: int = 0,
+    order: str = "severity",
+    state: DetectorState = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> dict:
+    """
+    Scores every row of the CSV with the chosen detector, per value of
+    `group_by` when given, reading the file chunk by chunk. Rows are assumed
+    to be in time order. All anomalies are counted, and one page of them is
+    returned with the row number, the expected value, a signed severity and
+    the direction ("high" or "low") added to each row.
+
+    Passing the `state` returned by a previous call continues from where
+    that call stopped, so only newly appended rows need to be sent.
+    """
+    needed = [kpi_column] + ([group_by] if group_by else [])
+    missing = [c for c in needed if c not in read_header(source)]
+    if missing:
+        raise MissingColumnsError(missing)
+
+    settings = DetectorState(method, kpi_column, group_by, window, sensitivity, threshold)
+    if state is None:
+        state = settings
+    elif state.settings != settings.settings:
+        raise ValueError("The stream was started with different detector settings.")
+
+    collector = AnomalyCollector(limit, offset, order)
+    scored = 0
+    dtype = {group_by: str} if group_by else None
+    for chunk in iter_csv_chunks(source, dtype=dtype, chunk_rows=chunk_rows):
+        row_numbers = np.arange(state.rows_seen, state.rows_seen + len(chunk))
+        state.rows_seen += len(chunk)
+        values = pd.to_numeric(chunk[kpi_column], errors="coerce").to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        if group_by:
+            valid &= chunk[group_by].notna().to_numpy()
+        keys = chunk[group_by].to_numpy()[valid] if group_by else np.zeros(valid.sum(), dtype=np.int64)
+        if not valid.any():
+            continue
+
+        expected, severity = state.score(keys, values[valid])
+        scored += int((~np.isnan(severity)).sum())
+        flagged = state.is_anomaly(severity)
+        if not flagged.any():
+            continue
+
+        rows = chunk[valid][flagged].copy()
+        rows.index = row_numbers[valid][flagged]
+        rows["row_number"] = rows.index
+        rows["expected"] = np.round(expected[flagged], 4)
+        rows["severity"] = np.round(severity[flagged], 4)
+        rows["direction"] = np.where(severity[flagged] > 0, "high", "low")
+        collector.add(rows)
+
+    page = collector.page()
+    return {
+        "count": collector.count,
+        "scored": scored,
+        # NaN isn't valid JSON, so missing cells become None
+        "rows": page.astype(object).where(page.notna(), None).to_dict(orient="records"),
+        "state": state,
+    }
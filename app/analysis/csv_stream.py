@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from ..services.metrics import Histogram
+
+# Rows parsed at a time; memory use is proportional to this, not to the file size
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "200000"))
+
+csv_parse_seconds = Histogram("csv_parse_seconds", "Time spent parsing each CSV read by an analysis.")
+
+
+class MissingColumnsError(ValueError):
+    """Raised when the CSV doesn't have the columns an analysis needs."""
+
+
+def save_upload(binary_file) -> str:
+    """
+    Copies an uploaded file to a named temporary file and returns its path, so
+    it can be read from a worker process. The caller deletes the file.
+    """
+    binary_file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as target:
+        shutil.copyfileobj(binary_file, target, 1024 * 1024)
+    return target.name
+
+
+def read_header(source) -> list:
+    """Returns the column names of a CSV (a path or a binary file, which is rewound) or a DataFrame."""
+    if isinstance(source, pd.DataFrame):
+        return list(source.columns)
+    columns = list(pd.read_csv(source, nrows=0).columns)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return columns
+
+
+def iter_csv_chunks(source, columns=None, dtype=None, chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Yields DataFrames of at most chunk_rows rows, parsing only `columns` when
+    given. The source can also be an already parsed DataFrame (a stored
+    dataset), which is sliced into chunks with the same columns and types.
+    """
+    if isinstance(source, pd.DataFrame):
+        yield from _frame_chunks(source, columns, dtype, chunk_rows)
+        return
+    reader = pd.read_csv(source, usecols=columns, dtype=dtype, chunksize=chunk_rows)
+    # Only time spent inside the parser counts, not the caller's work between chunks
+    parsing = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(reader, None)
+            parsing += time.perf_counter() - start
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        csv_parse_seconds.observe(parsing)
+
+
+def _frame_chunks(frame: pd.DataFrame, columns, dtype, chunk_rows: int):
+    if columns is not None:
+        frame = frame[[c for c in frame.columns if c in columns]]
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        if isinstance(dtype, dict):
+            for column, column_type in dtype.items():
+                if column_type is str and chunk[column].dtype != object:
+                    # Like read_csv with dtype=str: text, with missing values left missing.
+                    # Each distinct value is converted once, which matters for group keys
+                    codes, uniques = pd.factorize(chunk[column])
+                    labels = np.append(np.asarray(uniques).astype(str).astype(object), np.nan)
+                    chunk = chunk.assign(**{column: labels[codes]})
+        elif dtype is not None:
+            chunk = chunk.astype(dtype)
+        yield chunk
+
+
+def _require(source, needed):
+    missing = [c for c in needed if c not in read_header(source)]
+    if missing:
+        raise MissingColumnsError(missing)
+
+
+def linear_trend(source, kpi_column: str, chunk_rows: int = CSV_CHUNK_ROWS) -> dict:
+    """
+    Fits kpi = slope * year + intercept by ordinary least squares, reading the
+    CSV chunk by chunk and keeping only running sums. Only the 'year' and KPI
+    columns are parsed, as float32. Rows with a missing value are skipped.
+    """
+    _require(source, ["year", kpi_column])
+
+    n = sx = sy = sxx = sxy = 0.0
+    origin = None
+    max_year = None
+    for chunk in iter_csv_chunks(source, ["year", kpi_column], "float32", chunk_rows):
+        chunk = chunk.dropna()
+        if chunk.empty:
+            continue
+        x = chunk["year"].to_numpy(dtype="float64")
+        y = chunk[kpi_column].to_numpy(dtype="float64")
+        # Sums are taken around the first year seen to keep them well conditioned
+        if origin is None:
+            origin = x[0]
+        x = x - origin
+        n += len(x)
+        sx += x.sum()
+        sy += y.sum()
+        sxx += (x * x).sum()
+        sxy += (x * y).sum()
+        chunk_max = x.max() + origin
+        max_year = chunk_max if max_year is None else max(max_year, chunk_max)
+
+    if n == 0:
+        raise ValueError("The CSV has no rows with both 'year' and the KPI column filled in.")
+
+    denominator = n * sxx - sx * sx
+    slope = (n * sxy - sx * sy) / denominator if denominator else 0.0
+    intercept = (sy - slope * sx) / n - slope * origin
+    return {"rows": int(n), "slope": slope, "intercept": intercept, "max_year": max_year}
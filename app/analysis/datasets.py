@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .csv_stream import CSV_CHUNK_ROWS, iter_csv_chunks
+from ..services.components import register_component
+
+# Parsed datasets are stored as Parquet files named after a hash of the uploaded CSV
+DATASET_DIR = Path(os.getenv("DATASET_DIR", Path(__file__).resolve().parent.parent / "data" / "datasets"))
+# Memory allowed for parsed frames kept in each analysis worker process
+DATASET_CACHE_MB = int(os.getenv("DATASET_CACHE_MB", "512"))
+PREVIEW_ROWS = 5
+
+
+class DatasetNotFoundError(KeyError):
+    """Raised when no dataset has been stored under the given ID."""
+
+
+def _column_types(path: str, chunk_rows: int) -> dict:
+    """
+    Finds a type for every column that holds for the whole file: pandas infers
+    a type per chunk, so e.g. an integer column with a gap in a later chunk
+    becomes float, and a column that is text anywhere becomes text.
+    """
+    kinds = {}
+    for chunk in iter_csv_chunks(path, chunk_rows=chunk_rows):
+        for column, dtype in chunk.dtypes.items():
+            kinds.setdefault(column, set()).add(dtype.kind)
+
+    types = {}
+    for column, seen in kinds.items():
+        if seen <= {"i"}:
+            types[column] = pa.int64()
+        elif seen <= {"b"}:
+            types[column] = pa.bool_()
+        elif seen <= {"i", "f"}:
+            types[column] = pa.float64()
+        else:
+            types[column] = pa.string()
+    return types
+
+
+class FrameCache:
+    """An LRU of parsed frames bounded by their total size in memory."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, frame: pd.DataFrame):
+        size = int(frame.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._frames:
+                self.bytes -= self._frames.pop(key)[1]
+            self._frames[key] = (frame, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._frames.popitem(last=False)
+                self.bytes -= evicted
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._frames.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def stats(self) -> dict:
+        return {"frames": len(self._frames), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+class DatasetRegistry:
+    """
+    Stores uploaded CSVs as Parquet files under the hash of their content, so
+    the same file uploaded twice is stored (and parsed) once. Analyses load the
+    columnar copy, memory-mapped, instead of parsing the CSV again, and
+    recently used frames stay in memory.
+    """
+
+    def __init__(self, directory: Path = DATASET_DIR, cache_bytes: int = DATASET_CACHE_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.frames = FrameCache(cache_bytes)
+
+    def _paths(self, dataset_id: str):
+        # IDs are hex digests; anything else can't name a stored dataset
+        if not dataset_id or not all(c in "0123456789abcdef" for c in dataset_id):
+            raise DatasetNotFoundError(dataset_id)
+        return self.directory / f"{dataset_id}.parquet", self.directory / f"{dataset_id}.json"
+
+    def store(self, csv_path: str, name: str = None, chunk_rows: int = CSV_CHUNK_ROWS) -> dict:
+        """Converts a CSV file to Parquet (unless it is already stored) and returns its info."""
+        digest = hashlib.sha256()
+        with open(csv_path, "rb") as f:
+            while block := f.read(1024 * 1024):
+                digest.update(block)
+        dataset_id = digest.hexdigest()[:32]
+        data_path, info_path = self._paths(dataset_id)
+        if info_path.exists():
+            return {**self.info(dataset_id), "created": False}
+
+        # Two passes: one to settle each column's type, one to convert chunk by chunk
+        types = _column_types(csv_path, chunk_rows)
+        schema = pa.schema([(column, arrow_type) for column, arrow_type in types.items()])
+        dtype = {column: str for column, arrow_type in types.items() if arrow_type == pa.string()}
+        rows = 0
+        temporary = data_path.with_suffix(f".{os.getpid()}.tmp")
+        with pq.ParquetWriter(temporary, schema) as writer:
+            for chunk in iter_csv_chunks(csv_path, dtype=dtype, chunk_rows=chunk_rows):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        os.replace(temporary, data_path)
+
+        info = {
+            "dataset_id": dataset_id,
+            "name": name,
+            "rows": rows,
+            "columns": {column: str(arrow_type) for column, arrow_type in types.items()},
+            "bytes": data_path.stat().st_size,
+            "created_at": time.time(),
+        }
+        info_path.write_text(json.dumps(info))
+        return {**info, "created": True}
+
+    def info(self, dataset_id: str) -> dict:
+        _, info_path = self._paths(dataset_id)
+        try:
+            return json.loads(info_path.read_text())
+        except FileNotFoundError:
+            raise DatasetNotFoundError(dataset_id)
+
+    def list(self) -> list:
+        return [json.loads(path.read_text()) for path in sorted(self.directory.glob("*.json"))]
+
+    def preview(self, dataset_id: str, rows: int = PREVIEW_ROWS) -> list:
+        data_path, _ = self._paths(dataset_id)
+        batch = next(pq.ParquetFile(data_path).iter_batches(batch_size=rows), None)
+        frame = batch.to_pandas() if batch is not None else pd.DataFrame()
+        return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+    def load(self, dataset_id: str) -> pd.DataFrame:
+        """Returns the parsed frame, from memory when it was used recently."""
+        data_path, _ = self._paths(dataset_id)
+        # Checked even on a cache hit, since another process may have deleted the dataset
+        if not data_path.exists():
+            raise DatasetNotFoundError(dataset_id)
+        frame = self.frames.get(dataset_id)
+        if frame is not None:
+            return frame
+        frame = pq.read_table(data_path, memory_map=True).to_pandas()
+        self.frames.set(dataset_id, frame)
+        return frame
+
+    def delete(self, dataset_id: str):
+        data_path, info_path = self._paths(dataset_id)
+        if not info_path.exists():
+            raise DatasetNotFoundError(dataset_id)
+        info_path.unlink()
+        data_path.unlink(missing_ok=True)
+        self.frames.discard(dataset_id)
+
+
+# Created on first use in each process (the API process and every analysis worker)
+registry_component = register_component("dataset_registry", DatasetRegistry)
+
+
+def get_registry() -> DatasetRegistry:
+    return registry_component.get()
+
+
+def store_dataset(csv_path: str, name: str = None) -> dict:
+    """Stores a CSV as a dataset and adds a preview of its first rows."""
+    info = get_registry().store(csv_path, name)
+    return {**info, "preview": get_registry().preview(info["dataset_id"])}
+
+
+def run_on_dataset(dataset_id: str, fn, *args):
+    """Calls fn(frame, *args) with the dataset's parsed frame; runs in an analysis worker."""
+    return fn(get_registry().load(dataset_id), *args)
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+from .csv_stream import CSV_CHUNK_ROWS, MissingColumnsError, iter_csv_chunks, read_header
+
+# The six running sums that determine a least-squares line and its residual variance
+_SUMS = ("n", "sx", "sy", "sxx", "sxy", "syy")
+
+
+class TrendAccumulator:
+    """
+    Accumulates per-(group, KPI) sums of x, y, x², xy and y² over chunks of
+    rows, so every line can be fitted at the end in one vectorized step
+    without keeping the rows. Missing KPI values are left out of that KPI's
+    sums only.
+    """
+
+    def __init__(self, n_kpis: int):
+        self.n_kpis = n_kpis
+        self.group_ids = {}
+        self.sums = {name: np.zeros((0, n_kpis)) for name in _SUMS}
+        self.max_x = np.zeros(0)
+        # Years and values are shifted by the first ones seen to keep the sums well conditioned
+        self.x_origin = None
+        self.y_origin = None
+
+    def _group_codes(self, keys) -> np.ndarray:
+        codes, uniques = pd.factorize(keys)
+        mapping = np.array([self.group_ids.setdefault(key, len(self.group_ids)) for key in uniques], dtype=np.int64)
+        grown = len(self.group_ids) - len(self.max_x)
+        if grown:
+            for name in _SUMS:
+                self.sums[name] = np.vstack([self.sums[name], np.zeros((grown, self.n_kpis))])
+            self.max_x = np.concatenate([self.max_x, np.full(grown, -np.inf)])
+        return mapping[codes]
+
+    def add(self, keys, x: np.ndarray, y: np.ndarray):
+        """Adds rows: keys (one per row), years x of shape (rows,) and KPI values y of shape (rows, kpis)."""
+        if len(x) == 0:
+            return
+        if self.x_origin is None:
+            self.x_origin = x[0]
+            counts = (~np.isnan(y)).sum(axis=0)
+            self.y_origin = np.nansum(y, axis=0) / np.maximum(counts, 1)
+        codes = self._group_codes(keys)
+
+        x = x - self.x_origin
+        mask = ~np.isnan(y)
+        y = np.where(mask, y - self.y_origin, 0.0)
+        xm = mask * x[:, None]
+        terms = {"n": mask.astype(np.float64), "sx": xm, "sy": y, "sxx": xm * x[:, None], "sxy": y * x[:, None], "syy": y * y}
+
+        # Sort rows by group once, then sum each group's run of rows
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        groups = sorted_codes[starts]
+        for name, values in terms.items():
+            self.sums[name][groups] += np.add.reduceat(values[order], starts, axis=0)
+        np.maximum.at(self.max_x, groups, np.maximum.reduceat(x[order], starts))
+
+    def fit(self, horizon: int, confidence: float) -> dict:
+        """
+        Fits every (group, KPI) line at once and predicts `horizon` years past
+        each group's last year. Returns arrays of shape (groups, kpis) for the
+        fit and (groups, kpis, horizon) for the predictions and their
+        prediction intervals. Lines with fewer than three points get no interval.
+        """
+        s = self.sums
+        n = s["n"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_x = s["sx"] / n
+            mean_y = s["sy"] / n
+            sxx = s["sxx"] - s["sx"] * mean_x
+            sxy = s["sxy"] - s["sx"] * mean_y
+            syy = s["syy"] - s["sy"] * mean_y
+            slope = np.where(sxx > 0, sxy / sxx, 0.0)
+            intercept = mean_y - slope * mean_x
+            residual = np.maximum(syy - slope * sxy, 0.0)
+            sigma = np.where(n > 2, np.sqrt(residual / (n - 2)), np.nan)
+
+            steps = np.arange(1, horizon + 1)
+            x_future = self.max_x[:, None, None] + steps  # (groups, 1, horizon)
+            predicted = intercept[..., None] + slope[..., None] * x_future
+            leverage = np.where(sxx[..., None] > 0, (x_future - mean_x[..., None]) ** 2 / sxx[..., None], 0.0)
+            spread = sigma[..., None] * np.sqrt(1 + 1 / n[..., None] + leverage)
+            # Lines mostly share a handful of sample sizes, so each quantile is computed once
+            # scipy.stats is slow to import, so it is only loaded when a forecast is fitted
+            from scipy.stats import t as student_t
+
+            dof, inverse = np.unique(np.maximum(n - 2, 1), return_inverse=True)
+            t_value = student_t.ppf((1 + confidence) / 2, dof)[inverse].reshape(n.shape)[..., None]
+            margin = t_value * spread
+
+        x_origin = self.x_origin or 0.0
+        y_origin = self.y_origin if self.y_origin is not None else np.zeros(self.n_kpis)
+        predicted = predicted + y_origin[:, None]
+        return {
+            "rows": n.astype(np.int64),
+            "slope": slope,
+            "intercept": intercept + y_origin - slope * x_origin,
+            "last_year": self.max_x + x_origin,
+            "years": self.max_x[:, None] + x_origin + steps,
+            "predicted": predicted,
+            "lower": predicted - margin,
+            "upper": predicted + margin,
+        }
+
+
+def numeric_kpis(source, exclude, chunk_rows: int = CSV_CHUNK_ROWS) -> list:
+    """Guesses the numeric KPI columns from the first chunk of the CSV."""
+    if isinstance(source, pd.DataFrame):
+        sample = source.head(min(chunk_rows, 10000))
+    else:
+        # Unlike an abandoned chunk reader, read_csv with nrows leaves the file open for the real pass
+        sample = pd.read_csv(source, nrows=min(chunk_rows, 10000))
+        if hasattr(source, "seek"):
+            source.seek(0)
+    return [c for c in sample.select_dtypes("number").columns if c not in exclude]
+
+
+def forecast_kpis(
+    source,
+    kpi_columns: list = None,
+    group_by: str = None,
+    horizon: int = 1,
+    confidence: float = 0.95,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> dict:
+    """
+    Forecasts every KPI column (all numeric columns when kpi_columns is not
+    given) `horizon` years ahead with a linear trend per KPI, and per value of
+    `group_by` when given. The CSV is read chunk by chunk and all trends are
+    fitted together, so the cost barely depends on the number of groups.
+    """
+    header = read_header(source)
+    needed = ["year"] + list(kpi_columns or []) + ([group_by] if group_by else [])
+    missing = [c for c in needed if c not in header]
+    if missing:
+        raise MissingColumnsError(missing)
+
+    kpis = list(kpi_columns) if kpi_columns else numeric_kpis(source, {"year", group_by}, chunk_rows)
+    if not kpis:
+        raise ValueError("The CSV has no numeric KPI columns to forecast.")
+
+    accumulator = TrendAccumulator(len(kpis))
+    columns = ["year"] + kpis + ([group_by] if group_by else [])
+    dtype = {group_by: str} if group_by else None
+    for chunk in iter_csv_chunks(source, columns, dtype, chunk_rows):
+        year = pd.to_numeric(chunk["year"], errors="coerce")
+        keep = year.notna() & (chunk[group_by].notna() if group_by else True)
+        chunk = chunk[keep]
+        values = chunk[kpis].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        keys = chunk[group_by].to_numpy() if group_by else np.zeros(len(chunk), dtype=np.int64)
+        accumulator.add(keys, year[keep].to_numpy(dtype=np.float64), values)
+
+    if not accumulator.group_ids:
+        raise ValueError("The CSV has no rows with a 'year' value.")
+
+    fit = accumulator.fit(horizon, confidence)
+    groups = list(accumulator.group_ids) if group_by else [None]
+    return {"groups": groups, "kpis": kpis, **fit}
+
+
+def _json_floats(values: np.ndarray) -> list:
+    # NaN (no interval) isn't valid JSON, so it becomes None; the object array is only built when needed
+    if np.isnan(values).any():
+        values = np.where(np.isnan(values), None, values)
+    return values.tolist()
+
+
+def forecast_records(result: dict, decimals: int = 2) -> list:
+    """Turns the arrays from forecast_kpis into one JSON-friendly record per (group, KPI) with data."""
+    rows = result["rows"]
+    lists = {name: _json_floats(np.round(result[name], decimals)) for name in ("predicted", "lower", "upper")}
+    slopes = np.round(result["slope"], 6).tolist()
+    years = result["years"].astype(np.int64).tolist()
+
+    records = []
+    for g, group in enumerate(result["groups"]):
+        for k, kpi in enumerate(result["kpis"]):
+            if rows[g, k] == 0:
+                continue
+            record = {"kpi": kpi, "rows": int(rows[g, k]), "slope": slopes[g][k], "forecast": [
+                {"year": year, "value": value, "lower": lower, "upper": upper}
+                for year, value, lower, upper in zip(
+                    years[g], lists["predicted"][g][k], lists["lower"][g][k], lists["upper"][g][k]
+                )
+            ]}
+            if group is not None:
+                record = {"group": group, **record}
+            records.append(record)
+    return records
+
+
+def forecast_columns(result: dict, decimals: int = 2) -> dict:
+    """
+    A compact alternative to forecast_records: for each KPI, lists indexed by
+    group (and then by forecast year). Much cheaper to build and send when
+    there are thousands of groups.
+    """
+    columns = {
+        name: _json_floats(np.round(result[name], decimals).transpose(1, 0, 2))
+        for name in ("predicted", "lower", "upper")
+    }
+    rows = result["rows"].T.tolist()
+    slopes = np.round(result["slope"], 6).T.tolist()
+    return {
+        "groups": result["groups"],
+        "years": result["years"].astype(np.int64).tolist(),
+        "kpis": {
+            kpi: {
+                "rows": rows[k],
+                "slope": slopes[k],
+                "value": columns["predicted"][k],
+                "lower": columns["lower"][k],
+                "upper": columns["upper"][k],
+            }
+            for k, kpi in enumerate(result["kpis"])
+        },
+    }
+
+
+def forecast_report(source, kpi_columns=None, group_by=None, horizon=1, confidence=0.95, layout="records") -> dict:
+    """Runs forecast_kpis and formats the result, so both happen in the worker process."""
+    result = forecast_kpis(source, kpi_columns, group_by, horizon, confidence)
+    if layout == "columns":
+        return {"kpis": result["kpis"], "group_count": len(result["groups"]), "columns": forecast_columns(result)}
+    return {"kpis": result["kpis"], "group_count": len(result["groups"]), "forecasts": forecast_records(result)}
@@ -1,21 +1,71 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from ..services.llm_service import ask_llm
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from ..services.llm_service import ask_llm_async, stream_llm, cache_stats, batch_stats, LLMOverloadedError
+from ..services.executors import ExecutorOverloadedError
+from ..services.rag_service import ask_with_context, prepare_context_prompt, RAG_TOP_K, RAG_CONTEXT_TOKENS
+from .streaming import sse_response
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     prompt: str
+    use_cache: bool = True
+    # Retrieval-augmented mode: answer using chunks from the uploaded documents
+    use_rag: bool = False
+    top_k: int = Field(RAG_TOP_K, ge=1, le=50)
+    context_tokens: int = Field(RAG_CONTEXT_TOKENS, ge=100, le=30000)
+    document_id: Optional[str] = None
 
 @router.post("/ask", tags=["Chat Assistant"])
 async def ask_assistant(request: ChatRequest):
     """
     Receives a prompt from the user and returns a response from the LLM.
+    With use_rag, relevant document chunks are added to the prompt and the
+    response also lists the sources and per-stage timings.
     """
     try:
-        # We can create a more sophisticated prompt or system message later
-        # For now, we'll pass the user's prompt directly to the LLM
-        response_text = ask_llm(request.prompt)
+        if request.use_rag:
+            result = await ask_with_context(
+                request.prompt, request.top_k, request.context_tokens, _metadata_filter(request), request.use_cache
+            )
+            return {"status": "success", **result}
+
+        # Without RAG, the user's prompt goes directly to the LLM
+        # Chat questions repeat a lot, so similar (not just identical) ones share answers
+        response_text = await ask_llm_async(request.prompt, use_cache=request.use_cache, semantic=True, lane="chat")
         return {"status": "success", "response": response_text}
+    except (LLMOverloadedError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+@router.post("/ask-stream", tags=["Chat Assistant"])
+async def ask_assistant_stream(request: ChatRequest):
+    """
+    Same as /ask, but streams the response as Server-Sent Events while the LLM generates it.
+    With use_rag, the first event is `data: {"sources": [...]}` with the chunks the answer is based on.
+    """
+    if not request.use_rag:
+        return await sse_response(stream_llm(request.prompt, use_cache=request.use_cache, semantic=True))
+
+    timings = {}
+    try:
+        prompt, context = await prepare_context_prompt(
+            request.prompt, request.top_k, request.context_tokens, _metadata_filter(request), timings
+        )
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return await sse_response(
+        stream_llm(prompt, use_cache=request.use_cache), header={"sources": context, "timings": timings}
+    )
+
+def _metadata_filter(request: ChatRequest):
+    return {"document_id": {"$eq": request.document_id}} if request.document_id else None
+
+@router.get("/cache-stats", tags=["Chat Assistant"])
+async def get_cache_stats():
+    """
+    Returns hit/miss counters for the LLM response cache and micro-batching statistics.
+    """
+    return {**cache_stats(), "batching": batch_stats()}
@@ -1,63 +1,213 @@
-import pandas as pd
-from io import StringIO
+import asyncio
+import contextlib
+import os
+from collections import defaultdict
+from typing import List, Literal, Optional
 from fastapi import APIRouter, UploadFile, File, Query, HTTPException
-from sklearn.linear_model import LinearRegression
+from ..analysis.anomalies import detect_anomalies, stream_states
+from ..analysis.csv_stream import linear_trend, save_upload, MissingColumnsError
+from ..analysis.datasets import get_registry, store_dataset, run_on_dataset, DatasetNotFoundError
+from ..analysis.forecasting import forecast_report
+from ..services.executors import run_in_executor, ExecutorOverloadedError
 
 router = APIRouter()
 
+# Calls for the same anomaly stream run one at a time, so each sees the state left by the last
+_stream_locks = defaultdict(asyncio.Lock)
+
+
+def check_source(file: Optional[UploadFile], dataset_id: Optional[str]):
+    if (file is None) == (dataset_id is None):
+        raise HTTPException(status_code=400, detail="Upload a CSV file or pass a dataset_id (but not both).")
+
+
+async def run_analysis(file: Optional[UploadFile], dataset_id: Optional[str], fn, *args):
+    """
+    Runs fn(source, *args) on the analysis process pool, so parsing a large CSV
+    doesn't slow down the requests being served by this process. The source is
+    either the uploaded CSV or the parsed frame of a stored dataset.
+    """
+    if dataset_id is not None:
+        return await run_in_executor("analysis", run_on_dataset, dataset_id, fn, *args)
+
+    # Worker processes can't share the upload's file object, so it's copied to disk
+    path = await asyncio.to_thread(save_upload, file.file)
+    try:
+        return await run_in_executor("analysis", fn, path, *args)
+    finally:
+        os.remove(path)
+
+
+@router.post("/datasets", tags=["Data Analysis"])
+async def upload_dataset(file: UploadFile = File(...)):
+    """
+    Stores a CSV as a dataset and returns its ID, columns and first rows. The ID can
+    be passed to the analysis endpoints instead of uploading the file again; it is a
+    hash of the content, so uploading the same file twice returns the same ID.
+    """
+    path = await asyncio.to_thread(save_upload, file.file)
+    try:
+        return await run_in_executor("analysis", store_dataset, path, file.filename)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the CSV: {e}")
+    finally:
+        os.remove(path)
+
+
+@router.get("/datasets", tags=["Data Analysis"])
+async def list_datasets():
+    """Lists the stored datasets."""
+    return {"datasets": await asyncio.to_thread(get_registry().list)}
+
+
+@router.get("/datasets/{dataset_id}", tags=["Data Analysis"])
+async def get_dataset(dataset_id: str):
+    """Returns a stored dataset's columns, size and first rows."""
+    try:
+        info = await asyncio.to_thread(get_registry().info, dataset_id)
+        return {**info, "preview": await asyncio.to_thread(get_registry().preview, dataset_id)}
+    except DatasetNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+
+
+@router.delete("/datasets/{dataset_id}", tags=["Data Analysis"])
+async def delete_dataset(dataset_id: str):
+    """Deletes a stored dataset."""
+    try:
+        await asyncio.to_thread(get_registry().delete, dataset_id)
+        return {"status": "success"}
+    except DatasetNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+
+
 @router.post("/forecast", tags=["Data Analysis"])
-async def forecast_kpi(file: UploadFile = File(...), kpi_column: str = Query(...)):
+async def forecast_kpi(
+    file: Optional[UploadFile] = File(None),
+    kpi_column: str = Query(...),
+    dataset_id: Optional[str] = Query(None)
+):
     """
-    Accepts a CSV, a KPI column name, and forecasts the next year's value.
+    Accepts a CSV (or a stored dataset's ID), a KPI column name, and forecasts the next year's value.
     Assumes the CSV has a 'year' column.
     """
+    check_source(file, dataset_id)
     try:
-        contents = await file.read()
-        csv_data = StringIO(contents.decode("utf-8"))
-        df = pd.read_csv(csv_data)
-
-        if 'year' not in df.columns or kpi_column not in df.columns:
-            raise HTTPException(status_code=400, detail="CSV must contain 'year' and the specified KPI column.")
-
-        model = LinearRegression()
-        model.fit(df[['year']], df[[kpi_column]])
-        
-        next_year = df['year'].max() + 1
-        prediction = model.predict([[next_year]])
-        
+        # The upload is read in chunks and only the two needed columns are parsed
+        trend = await run_analysis(file, dataset_id, linear_trend, kpi_column)
+
+        next_year = trend["max_year"] + 1
+        prediction = trend["slope"] * next_year + trend["intercept"]
+
         return {
             "predicted_year": int(next_year),
             "kpi": kpi_column,
-            "predicted_value": round(prediction[0][0], 2)
+            "predicted_value": round(prediction, 2)
         }
+    except MissingColumnsError:
+        raise HTTPException(status_code=400, detail="CSV must contain 'year' and the specified KPI column.")
+    except DatasetNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/anomalies", tags=["Data Analysis"])
-async def detect_anomalies(
-    file: UploadFile = File(...), 
-    kpi_column: str = Query(...), 
-    threshold: float = Query(...)
+@router.post("/forecast-kpis", tags=["Data Analysis"])
+async def forecast_many_kpis(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None),
+    kpi_columns: Optional[List[str]] = Query(None),
+    group_by: Optional[str] = Query(None),
+    horizon: int = Query(1, ge=1, le=50),
+    confidence: float = Query(0.95, gt=0, lt=1),
+    layout: Literal["records", "columns"] = Query("records")
 ):
     """
-    Accepts a CSV, a KPI column, and a threshold to find anomalies.
+    Forecasts several KPIs at once (every numeric column unless kpi_columns is given),
+    optionally per value of a group column such as a district or sensor ID.
+    Each forecast covers `horizon` years and comes with a prediction interval.
+    Assumes the CSV (or the stored dataset) has a 'year' column.
     """
+    check_source(file, dataset_id)
     try:
-        contents = await file.read()
-        csv_data = StringIO(contents.decode("utf-8"))
-        df = pd.read_csv(csv_data)
-
-        if kpi_column not in df.columns:
-            raise HTTPException(status_code=400, detail=f"CSV does not contain the column '{kpi_column}'.")
-
-        anomalies = df[df[kpi_column] > threshold]
-        
-        return {
-            "kpi": kpi_column,
-            "threshold": threshold,
-            "anomaly_count": len(anomalies),
-            "anomalies": anomalies.to_dict(orient="records")
-        }
+        return await run_analysis(file, dataset_id, forecast_report, kpi_columns, group_by, horizon, confidence, layout)
+    except MissingColumnsError as e:
+        raise HTTPException(status_code=400, detail=f"CSV is missing the columns: {', '.join(e.args[0])}.")
+    except DatasetNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/anomalies", tags=["Data Analysis"])
+async def detect_anomalies_endpoint(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None),
+    kpi_column: str = Query(...),
+    method: Literal["threshold", "zscore", "iqr", "ewma"] = Query("threshold"),
+    threshold: Optional[float] = Query(None),
+    group_by: Optional[str] = Query(None),
+    window: int = Query(30, ge=2, le=10000),
+    sensitivity: Optional[float] = Query(None, gt=0),
+    order: Literal["severity", "row"] = Query("severity"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=100000),
+    stream_id: Optional[str] = Query(None)
+):
+    """
+    Accepts a CSV (or a stored dataset's ID) and a KPI column and finds anomalous rows, per value of `group_by` when given.
+    - threshold: values above `threshold`
+    - zscore / iqr: values far from the previous `window` values (in standard deviations / IQRs)
+    - ewma: values far from an exponentially weighted average with a span of `window` rows
+    All anomalies are counted, but only one page of them is returned, most severe first
+    (or in row order). With a `stream_id`, each call continues where the previous one for
+    that stream stopped, so only newly appended rows need to be uploaded.
+    """
+    check_source(file, dataset_id)
+    if method == "threshold" and threshold is None:
+        raise HTTPException(status_code=400, detail="The threshold method needs a 'threshold' value.")
+
+    async with _stream_locks[stream_id] if stream_id else contextlib.nullcontext():
+        state = stream_states.get(stream_id) if stream_id else None
+        try:
+            result = await run_analysis(
+                file, dataset_id, detect_anomalies, kpi_column, method, group_by, window,
+                sensitivity, threshold, limit, offset, order, state
+            )
+        except MissingColumnsError as e:
+            raise HTTPException(status_code=400, detail=f"CSV does not contain the column '{e.args[0][0]}'.")
+        except DatasetNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+        except ExecutorOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if stream_id:
+            stream_states.set(stream_id, result["state"])
+
+    returned = offset + len(result["rows"])
+    response = {
+        "kpi": kpi_column,
+        "method": method,
+        "threshold": threshold,
+        "group_by": group_by,
+        "anomaly_count": result["count"],
+        "rows_scored": result["scored"],
+        "truncated": result["count"] > returned,
+        "next_offset": returned if result["count"] > returned else None,
+        "anomalies": result["rows"]
+    }
+    if method != "threshold":
+        response.update({"window": window, "sensitivity": result["state"].sensitivity})
+    if stream_id:
+        response.update({"stream_id": stream_id, "rows_seen": result["state"].rows_seen})
+    return response
@@ -1,8 +1,9 @@
-import json
-from pathlib import Path
+import asyncio
 from datetime import datetime
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
+from ..services.feedback_store import get_feedback_store
 
 # Define the structure of the feedback data we expect
 class Feedback(BaseModel):
@@ -12,17 +13,10 @@ class Feedback(BaseModel):
 
 router = APIRouter()
 
-# Define the path for our log file
-DATA_DIR = Path("app/data")
-FEEDBACK_FILE = DATA_DIR / "feedback_log.json"
-
-# Ensure the data directory exists
-DATA_DIR.mkdir(exist_ok=True)
-
 @router.post("/submit-feedback", tags=["Citizen Feedback"])
 async def submit_feedback(feedback: Feedback):
     """
-    Receives feedback from the user and appends it to a JSON file.
+    Receives feedback from the user and appends it to the feedback store.
     """
     # Create a new record with a timestamp
     new_record = {
@@ -32,19 +26,42 @@ async def submit_feedback(feedback: Feedback):
         "message": feedback.message,
     }
 
-    # Read existing data, append new record, and write back
+    # The store batches concurrent submissions into a single commit
     try:
-        if FEEDBACK_FILE.exists():
-            with open(FEEDBACK_FILE, "r+") as f:
-                data = json.load(f)
-                data.append(new_record)
-                f.seek(0)
-                json.dump(data, f, indent=4)
-        else:
-            with open(FEEDBACK_FILE, "w") as f:
-                json.dump([new_record], f, indent=4)
-        
+        await get_feedback_store().add(new_record)
         return {"status": "success", "message": "Feedback submitted successfully."}
     
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+@router.get("/list", tags=["Citizen Feedback"])
+async def list_feedback(
+    category: Optional[str] = Query(None),
+    user: Optional[str] = Query(None),
+    start: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    end: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Returns feedback newest first, filtered by category, user and time range.
+    """
+    try:
+        records, next_cursor = await asyncio.to_thread(
+            get_feedback_store().query, category, user, start, end, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return {"status": "success", "feedback": records, "next_cursor": next_cursor}
+
+@router.get("/daily-counts", tags=["Citizen Feedback"])
+async def feedback_daily_counts(
+    category: Optional[str] = Query(None),
+    start_day: Optional[str] = Query(None, description="YYYY-MM-DD, inclusive"),
+    end_day: Optional[str] = Query(None, description="YYYY-MM-DD, inclusive"),
+):
+    """
+    Returns the number of feedback submissions per category per day.
+    """
+    counts = await asyncio.to_thread(get_feedback_store().daily_counts, category, start_day, end_day)
+    return {"status": "success", "counts": counts}
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ..services.components import component_status, components, WARM_UP_COMPONENTS
+from ..services.executors import executor_stats
+
+router = APIRouter()
+
+@router.get("/health", tags=["Health"])
+async def health():
+    """
+    Liveness check. Always succeeds while the process is serving requests,
+    and reports the state of each lazily created component and worker pool.
+    """
+    return {"status": "ok", "components": component_status(), "executors": executor_stats()}
+
+@router.get("/ready", tags=["Health"])
+async def ready():
+    """
+    Readiness check. Returns 503 until every warm-up component has loaded.
+    """
+    pending = [name for name in WARM_UP_COMPONENTS if name in components and not components[name].ready]
+    body = {"status": "ready" if not pending else "not_ready", "waiting_for": pending, "components": component_status()}
+    return JSONResponse(body, status_code=200 if not pending else 503)
@@ -0,0 +1,76 @@
+import time
+from contextlib import nullcontext
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from ..services.metrics import Histogram, TRACING_ENABLED, recent_traces, render, span
+
+router = APIRouter()
+
+request_seconds = Histogram(
+    "http_request_seconds", "Time to handle a request, including streaming the whole response.", ("method", "route", "status")
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the latency of every request under its route template (so
+    /vectors/jobs/{job_id} is one series, not one per job) and, with tracing
+    on, opens the root span that the services' spans nest under.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        # Request latency already has its own histogram, so without tracing no span is needed
+        trace = nullcontext()
+        if TRACING_ENABLED:
+            traceparent = dict(scope["headers"]).get(b"traceparent", b"").decode("latin-1")
+            trace = span("request", traceparent, method=scope["method"], path=scope["path"])
+
+        with trace as current:
+            async def send_with_status(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if current is not None:
+                        message.setdefault("headers", []).append((b"x-trace-id", current.trace_id.encode()))
+                await send(message)
+
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                path = _route_template(scope)
+                if current is not None:
+                    current.name = f"{scope['method']} {path}"
+                    current.attributes["status"] = status
+                request_seconds.observe(time.perf_counter() - start, method=scope["method"], route=path, status=status)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # A route of an included router may only know its path within that router,
+    # so the prefix is taken from the front of the request path
+    return scope["path"].rsplit("/", route.path.count("/"))[0] + route.path
+
+
+@router.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Counters and latency histograms in the Prometheus text format.
+    """
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/metrics/traces", tags=["Health"])
+async def traces(limit: int = Query(20, ge=1, le=1000)):
+    """
+    The most recent request traces, newest first (only when TRACING_ENABLED is set).
+    """
+    return {"enabled": TRACING_ENABLED, "traces": recent_traces(limit)}
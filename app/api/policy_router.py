@@ -1,32 +1,81 @@
-from fastapi import APIRouter
+from typing import Literal
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from ..services.llm_service import ask_llm
+from ..services.llm_service import ask_llm_async, stream_llm, ERROR_MESSAGE, LLMOverloadedError
+from ..services.summarizer import build_merge_prompt, summarize_long_document, summarize_sections, SECTION_MAX_CHARS
+from .streaming import sse_response
 
 # A Pydantic model to define the structure of the request body
 # This tells FastAPI to expect a JSON object with a single key "text"
 class PolicyRequest(BaseModel):
     text: str
+    use_cache: bool = True
+    # "auto" uses map-reduce summarization for documents longer than one section
+    mode: Literal["auto", "single", "map_reduce"] = "auto"
 
 # Create a new router
 router = APIRouter()
 
-@router.post("/summarize-policy", tags=["Policy Summarizer"])
-async def summarize_policy(request: PolicyRequest):
-    """
-    Endpoint to summarize a policy text. It receives text and returns an AI-generated summary.
-    """
+def build_summary_prompt(text: str) -> str:
     # We create a specific prompt for the summarization task
-    prompt = f"""
+    return f"""
     You are a smart city assistant. Please summarize the following policy document in simple, clear language for a citizen.
     Keep it concise and under 100 words.
 
     Document:
-    {request.text}
+    {text}
 
     Summary:
     """
 
+def _use_map_reduce(request: PolicyRequest) -> bool:
+    return request.mode == "map_reduce" or (request.mode == "auto" and len(request.text) > SECTION_MAX_CHARS)
+
+@router.post("/summarize-policy", tags=["Policy Summarizer"])
+async def summarize_policy(request: PolicyRequest):
+    """
+    Endpoint to summarize a policy text. It receives text and returns an AI-generated summary.
+    Long documents are split into sections that are summarized concurrently and then merged.
+    """
+    if _use_map_reduce(request):
+        try:
+            return await summarize_long_document(request.text, use_cache=request.use_cache)
+        except LLMOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    prompt = build_summary_prompt(request.text)
+
     # Send the complete prompt to the LLM service
-    summary = ask_llm(prompt)
+    try:
+        # Only exact matches are reused here: different documents wrapped in the
+        # same instructions can look alike to the embedding model
+        summary = await ask_llm_async(prompt, use_cache=request.use_cache, lane="policy")
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"summary": summary}
+
+@router.post("/summarize-policy-stream", tags=["Policy Summarizer"])
+async def summarize_policy_stream(request: PolicyRequest):
+    """
+    Same as /summarize-policy, but streams the summary as Server-Sent Events while it is generated.
+    For map-reduce, the sections are summarized first and the final merge is
+    streamed, after a `data: {"sections": ..., "cached_sections": ...}` event.
+    """
+    if not _use_map_reduce(request):
+        prompt = build_summary_prompt(request.text)
+        return await sse_response(stream_llm(prompt, use_cache=request.use_cache))
+
+    try:
+        partial = await summarize_sections(request.text, use_cache=request.use_cache)
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    header = {"sections": partial["sections"], "cached_sections": partial["cached_sections"]}
+    if partial["summaries"] is None:
+        return await sse_response(_error_tokens(), header=header)
+    prompt = build_merge_prompt(partial["summaries"])
+    return await sse_response(stream_llm(prompt, use_cache=request.use_cache), header=header)
 
-    return {"summary": summary}
\ No newline at end of file
+async def _error_tokens():
+    # A failed section fails the summary, as in /summarize-policy
+    yield ERROR_MESSAGE
@@ -0,0 +1,42 @@
+import json
+from contextlib import aclosing
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from ..services.llm_service import LLMOverloadedError
+
+
+def _sse_event(data: dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+async def sse_response(tokens, header: dict = None) -> StreamingResponse:
+    """
+    Wraps an async generator of text pieces into a Server-Sent Events response.
+    Each piece is sent as `data: {"token": ...}` and the stream ends with `data: {"done": true}`.
+    `header`, if given, is sent as the first event (e.g. the sources of a RAG answer).
+    The first piece is awaited up front so an overloaded LLM can still be reported as a 503.
+    The generator is closed as soon as the response ends, even when the client
+    disconnects, so the LLM slot it holds is released straight away.
+    """
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def events():
+        if header is not None:
+            yield _sse_event(header)
+        async with aclosing(tokens):
+            if first is not None:
+                yield _sse_event({"token": first})
+                async for token in tokens:
+                    yield _sse_event({"token": token})
+        yield _sse_event({"done": True})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,11 @@
+import zipfile
+from typing import List, Optional
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from pydantic import BaseModel
-from ..vectorstore.document_embedder import process_and_embed_document
-from ..vectorstore.document_retriever import search_documents
+from pydantic import BaseModel, Field
+from ..vectorstore.document_embedder import process_and_embed_document, iter_text
+from ..vectorstore.document_retriever import search_documents_batch, build_filter
+from ..services.executors import ExecutorOverloadedError
+from ..vectorstore.ingestion_jobs import job_manager, IngestionQueueFullError
 
 router = APIRouter()
 
@@ -14,33 +18,76 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only .txt files are allowed.")
 
     try:
-        # Read the file content
-        contents = await file.read()
-        document_text = contents.decode("utf-8")
-        
         # Use the filename as the document's unique ID
         document_id = file.filename
         
-        # Call the service to process and embed the document
-        num_vectors = process_and_embed_document(document_text, document_id)
+        # Call the service to process and embed the document, reading the file as it goes
+        stats = await process_and_embed_document(iter_text(file.file), document_id)
         
         return {
             "status": "success",
-            "message": f"Successfully processed '{document_id}' and created {num_vectors} vectors."
+            "message": f"Successfully processed '{document_id}' into {stats['chunks']} vectors "
+                       f"({stats['upserted']} new or changed, {stats['deleted']} removed).",
+            **stats,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@router.post("/bulk-upload", tags=["Vector Search"])
+async def bulk_upload(files: List[UploadFile] = File(...)):
+    """
+    Accepts several .txt files and/or .zip archives of .txt files and ingests them
+    in the background. Returns a job ID to poll with /vectors/jobs/{job_id}.
+    """
+    try:
+        job = await job_manager.submit([(f.filename, f.file) for f in files])
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IngestionQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"status": "accepted", "job_id": job.id, "files": len(job.files)}
+
+@router.get("/jobs/{job_id}", tags=["Vector Search"])
+async def get_ingestion_job(job_id: str):
+    """
+    Returns the progress of a bulk ingestion job, per file.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job.to_dict()
+
 class SearchRequest(BaseModel):
-    query: str
+    query: Optional[str] = None
+    # Several queries can be searched in one request
+    queries: Optional[List[str]] = None
+    top_k: int = Field(3, ge=1, le=100)
+    document_id: Optional[str] = None
+    filter: Optional[dict] = None
+    min_score: Optional[float] = None
 
 @router.post("/search-documents", tags=["Vector Search"])
 async def search_documents_endpoint(request: SearchRequest):
     """
-    Accepts a text query and returns the most relevant document chunks from Pinecone.
+    Accepts a text query (or a list of queries) and returns the most relevant document chunks from Pinecone.
     """
+    if request.query is None and not request.queries:
+        raise HTTPException(status_code=400, detail="Provide either 'query' or 'queries'.")
+
     try:
-        results = search_documents(request.query)
-        return {"status": "success", "results": results}
+        queries = ([request.query] if request.query is not None else []) + (request.queries or [])
+        metadata_filter = build_filter(request.document_id, request.filter)
+        results = await search_documents_batch(queries, request.top_k, metadata_filter, request.min_score)
+
+        response = {"status": "success"}
+        if request.query is not None:
+            response["results"] = results[0]
+            results = results[1:]
+        if request.queries:
+            response["batch_results"] = [{"query": q, "results": r} for q, r in zip(request.queries, results)]
+        return response
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
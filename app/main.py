@@ -1,3 +1,7 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 # This is the corrected import statement
 from app.api.policy_router import router as policy_router
@@ -5,8 +9,27 @@ from app.api.feedback_router import router as feedback_router  # <-- ADD THIS
 from app.api.vector_router import router as vector_router # <-- ADD THIS
 from app.api.chat_router import router as chat_router # <-- ADD THIS
 from app.api.data_analysis_router import router as analysis_router # <-- ADD THIS
+from app.api.health_router import router as health_router
+from app.api.metrics_router import router as metrics_router, RequestMetricsMiddleware
+from app.services.components import warm_up, WARM_UP_ON_STARTUP, WARM_UP_COMPONENTS
+from app.services.executors import shutdown_executors
+from app.services.metrics import METRICS_ENABLED, TRACING_ENABLED
 
-app = FastAPI(title="Sustainable Smart City Assistant API")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models and clients load lazily; warming them up in the background lets the
+    # server accept traffic (and answer /health) immediately
+    if WARM_UP_ON_STARTUP:
+        asyncio.get_running_loop().run_in_executor(None, warm_up, WARM_UP_COMPONENTS)
+    yield
+    # Worker processes would otherwise outlive the server
+    shutdown_executors()
+
+app = FastAPI(title="Sustainable Smart City Assistant API", lifespan=lifespan)
+if METRICS_ENABLED or TRACING_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
 
 # Now this line will work correctly
 app.include_router(policy_router, prefix="/policy")
@@ -14,7 +37,9 @@ app.include_router(feedback_router, prefix="/feedback")  # <-- AND THIS
 app.include_router(vector_router, prefix="/vectors") # <-- AND THIS
 app.include_router(chat_router, prefix="/chat") # <-- AND THIS
 app.include_router(analysis_router, prefix="/analysis") # <-- AND THIS
+app.include_router(health_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Smart City Assistant API"}
\ No newline at end of file
+    return {"message": "Welcome to the Smart City Assistant API"}
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Components created in the background when the API starts. /ready reports
+# not-ready until all of them are loaded. Set WARM_UP_ON_STARTUP=false to load
+# everything on first use instead.
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+WARM_UP_COMPONENTS = [
+    name.strip()
+    for name in os.getenv("WARM_UP_COMPONENTS", "llm,embedding_model,vector_index,feedback_store").split(",")
+    if name.strip()
+]
+
+
+class LazyComponent:
+    """
+    Builds an expensive object (a model, a client, ...) on first use instead of at import.
+    Creation is thread-safe and happens at most once; a failed creation is
+    remembered for the health endpoints and retried on the next call.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is None:
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.state = "error"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.state = "ready"
+                self.error = None
+        return self._value
+
+    def set(self, value):
+        """Replaces the component, e.g. with a local stand-in for benchmarks."""
+        with self._lock:
+            self._value = value
+            self.state = "ready"
+            self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def status(self) -> dict:
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds}
+
+
+# Every component the health endpoints report on
+components = {}
+
+
+def register_component(name: str, factory) -> LazyComponent:
+    component = LazyComponent(name, factory)
+    components[name] = component
+    return component
+
+
+def component_status() -> dict:
+    return {name: component.status() for name, component in components.items()}
+
+
+def warm_up(names=None):
+    """Creates the given components (all by default), logging instead of raising on failure."""
+    for name in names or list(components):
+        component = components.get(name)
+        if component is None:
+            logger.warning("Unknown component '%s' in warm-up list", name)
+            continue
+        try:
+            component.get()
+        except Exception as e:
+            logger.warning("Warm-up of '%s' failed: %s", name, e)
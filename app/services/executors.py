@@ -0,0 +1,157 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+from .metrics import Histogram, merge_snapshot, take_snapshot
+
+# Load environment variables
+load_dotenv()
+
+task_seconds = Histogram("executor_task_seconds", "Time tasks spend running on a worker pool.", ("pool", "task"))
+queue_seconds = Histogram(
+    "executor_queue_seconds", "Time tasks wait for a worker, plus moving arguments and results between processes.", ("pool",)
+)
+
+
+def _timed_call(fn, *args):
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+
+def _timed_call_in_worker(fn, *args):
+    # Metrics recorded in a worker process (e.g. CSV parse times) travel back with the result
+    result, seconds = _timed_call(fn, *args)
+    return result, seconds, take_snapshot()
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """Raised when a workload class already has as much work queued as it is allowed."""
+
+
+class WorkloadExecutor:
+    """
+    A thread or process pool for one class of work, with a cap on how many
+    tasks may be running or waiting at once. Work beyond the cap is rejected
+    straight away instead of queueing without bound behind a busy pool.
+    """
+
+    def __init__(self, name: str, kind: str, workers: int, max_queue: int):
+        self.name = name
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Pools are created on first use; worker processes take a while to spawn
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    # "spawn" avoids forking a process that already runs model threads
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._pool
+
+    def _reserve(self, bounded: bool = True):
+        with self._lock:
+            if bounded and self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorOverloadedError(f"The server is busy with {self.name} work, please try again later.")
+            self.in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+
+    async def run(self, fn, *args, bounded: bool = True):
+        """
+        Runs fn(*args) on the pool and waits for the result. Background work
+        that is already limited elsewhere can pass bounded=False so it waits
+        for the pool instead of being rejected.
+        """
+        self._reserve(bounded)
+        in_worker = self.kind == "process"
+        start = time.perf_counter()
+        try:
+            future = self.pool.submit(_timed_call_in_worker if in_worker else _timed_call, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            result, seconds, *snapshot = await asyncio.wrap_future(future)
+        except BrokenExecutor:
+            # A worker process died (e.g. out of memory); start a fresh pool next time
+            self._discard(future)
+            raise
+        if snapshot:
+            merge_snapshot(snapshot[0])
+        task_seconds.observe(seconds, pool=self.name, task=getattr(fn, "__name__", type(fn).__name__))
+        queue_seconds.observe(max(time.perf_counter() - start - seconds, 0.0), pool=self.name)
+        return result
+
+    def _discard(self, future):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+# One pool per class of CPU-heavy work, so a burst of one kind can't take over the others:
+# - analysis: pandas parsing and model fitting, in separate processes so they don't hold the GIL
+# - embedding: SentenceTransformer.encode, which releases the GIL while it computes
+executors = {
+    "analysis": WorkloadExecutor(
+        "analysis", "process",
+        workers=_env_int("ANALYSIS_WORKERS", max(1, (os.cpu_count() or 2) // 2)),
+        max_queue=_env_int("ANALYSIS_MAX_QUEUE", 16),
+    ),
+    "embedding": WorkloadExecutor(
+        "embedding", "thread",
+        workers=_env_int("EMBED_WORKERS", 2),
+        max_queue=_env_int("EMBED_MAX_QUEUE", 64),
+    ),
+}
+
+
+async def run_in_executor(workload: str, fn, *args, bounded: bool = True):
+    """Runs fn(*args) on the pool for `workload`, raising ExecutorOverloadedError when it is full."""
+    return await executors[workload].run(fn, *args, bounded=bounded)
+
+
+def executor_stats() -> dict:
+    return {name: executor.stats() for name, executor in executors.items()}
+
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown()
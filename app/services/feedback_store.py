@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from .components import register_component
+from .metrics import Histogram, SIZE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+feedback_write_seconds = Histogram("feedback_write_seconds", "Duration of feedback commits, each covering one batch.")
+feedback_batch_size = Histogram("feedback_batch_size", "Submissions written per commit.", buckets=SIZE_BUCKETS)
+
+# Define the paths for our feedback storage
+DATA_DIR = Path("app/data")
+FEEDBACK_DB = DATA_DIR / "feedback.db"
+LEGACY_FEEDBACK_FILE = DATA_DIR / "feedback_log.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    user TEXT NOT NULL,
+    category TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp);
+CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback (category, timestamp);
+CREATE INDEX IF NOT EXISTS idx_feedback_user ON feedback (user, timestamp);
+
+-- Per-day, per-category counts, kept up to date on every insert
+CREATE TABLE IF NOT EXISTS feedback_daily_counts (
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, category)
+) WITHOUT ROWID;
+"""
+
+COLUMNS = ("timestamp", "user", "category", "message")
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Opens a connection to the feedback database in WAL mode."""
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Every commit is fsynced; the group-commit writer keeps that to one flush per batch
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.executescript(SCHEMA)
+    _rebuild_rollup_if_missing(conn)
+    return conn
+
+
+def _rebuild_rollup_if_missing(conn: sqlite3.Connection):
+    # Databases created before the rollup table existed need it filled in once
+    has_feedback = conn.execute("SELECT 1 FROM feedback LIMIT 1").fetchone()
+    has_rollup = conn.execute("SELECT 1 FROM feedback_daily_counts LIMIT 1").fetchone()
+    if has_feedback and not has_rollup:
+        with conn:
+            conn.execute(
+                "INSERT INTO feedback_daily_counts (day, category, count) "
+                "SELECT substr(timestamp, 1, 10), category, COUNT(*) FROM feedback "
+                "GROUP BY substr(timestamp, 1, 10), category"
+            )
+
+
+class FeedbackStore:
+    """
+    Append-only feedback store backed by SQLite.
+    Submissions are handed to a single background writer thread which commits
+    everything that queued up since its last commit in one transaction, so a
+    burst of submissions costs a single disk flush.
+    """
+
+    def __init__(self, db_path: Path = FEEDBACK_DB, max_batch: int = 1000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_batch = max_batch
+        self._conn = connect(self.db_path)
+        # Reads use their own connection so they never wait behind the writer
+        self._read_conn = connect(self.db_path)
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="feedback-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, record: dict) -> Future:
+        """Queues one record for writing. The future resolves once it is committed."""
+        future = Future()
+        self._queue.put(([record], future))
+        return future
+
+    async def add(self, record: dict):
+        """Queues one record and waits until it has been durably written."""
+        await asyncio.wrap_future(self.submit(record))
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._conn.close()
+        self._read_conn.close()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # Take everything else that is already waiting, up to max_batch
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        records = [record for records, _ in batch for record in records]
+        start = time.perf_counter()
+        try:
+            with self._conn:
+                self._insert(records)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        feedback_write_seconds.observe(time.perf_counter() - start)
+        feedback_batch_size.observe(len(records))
+        for _, future in batch:
+            future.set_result(None)
+
+    def _insert(self, records):
+        self._conn.executemany(
+            "INSERT INTO feedback (timestamp, user, category, message) VALUES (?, ?, ?, ?)",
+            [tuple(record[column] for column in COLUMNS) for record in records],
+        )
+        # Update the daily rollup in the same transaction, one row per (day, category)
+        counts = Counter((record["timestamp"][:10], record["category"]) for record in records)
+        self._conn.executemany(
+            "INSERT INTO feedback_daily_counts (day, category, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (day, category) DO UPDATE SET count = count + excluded.count",
+            [(day, category, count) for (day, category), count in counts.items()],
+        )
+
+    def query(
+        self,
+        category: str = None,
+        user: str = None,
+        start: str = None,
+        end: str = None,
+        limit: int = 50,
+        cursor: str = None,
+    ):
+        """
+        Returns (records, next_cursor) for the newest feedback matching the filters.
+        `start`/`end` are ISO timestamps (end is exclusive). Pass the returned
+        cursor back in to fetch the next page; it is None on the last page.
+        Pages are ordered newest first by (timestamp, id), which matches the
+        indexes, so deep pages cost the same as the first one.
+        """
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if user is not None:
+            clauses.append("user = ?")
+            params.append(user)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        if cursor is not None:
+            cursor_timestamp, cursor_id = cursor.rsplit("|", 1)
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend((cursor_timestamp, int(cursor_id)))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        sql = f"SELECT id, timestamp, user, category, message FROM feedback {where} ORDER BY timestamp DESC, id DESC LIMIT ?"
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, (*params, limit + 1)).fetchall()
+
+        records = [dict(zip(("id", *COLUMNS), row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = f"{records[-1]['timestamp']}|{records[-1]['id']}"
+        return records, next_cursor
+
+    def daily_counts(self, category: str = None, start_day: str = None, end_day: str = None):
+        """Returns feedback counts per category per day from the rollup table (end_day inclusive)."""
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if start_day is not None:
+            clauses.append("day >= ?")
+            params.append(start_day)
+        if end_day is not None:
+            clauses.append("day <= ?")
+            params.append(end_day)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        sql = f"SELECT day, category, count FROM feedback_daily_counts {where} ORDER BY day, category"
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+        return [{"day": day, "category": category, "count": count} for day, category, count in rows]
+
+    def migrate_json_log(self, json_path: Path = LEGACY_FEEDBACK_FILE) -> int:
+        """
+        Imports the records from the old feedback_log.json array and renames the
+        file so it is only imported once. Returns the number of imported records.
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        with open(json_path, "r") as f:
+            records = json.load(f)
+        future = Future()
+        # Goes through the writer queue so it can't interleave with live submissions
+        self._queue.put((records, future))
+        future.result()
+        json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+        return len(records)
+
+
+def _create_feedback_store() -> FeedbackStore:
+    store = FeedbackStore()
+    migrated = store.migrate_json_log()
+    if migrated:
+        logger.info("Migrated %d feedback records from %s", migrated, LEGACY_FEEDBACK_FILE)
+    return store
+
+
+feedback_store_component = register_component("feedback_store", _create_feedback_store)
+
+
+def get_feedback_store() -> FeedbackStore:
+    """Returns the shared store, creating it (and migrating the old JSON log) on first use."""
+    return feedback_store_component.get()
@@ -1,27 +1,364 @@
+import asyncio
+import hashlib
+import logging
 import os
-import traceback
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
+from .components import register_component
+from .executors import run_in_executor, ExecutorOverloadedError
+from .metrics import Counter, Histogram, span
+from .micro_batcher import MicroBatcher
+from .response_cache import TTLCache, SemanticCache
 
 # Load environment variables
 load_dotenv()
 
-# Check for the GOOGLE_API_KEY
-if not os.getenv("GOOGLE_API_KEY"):
-    raise EnvironmentError("GOOGLE_API_KEY not found in .env file")
+logger = logging.getLogger(__name__)
+
+llm_seconds = Histogram("llm_call_seconds", "Duration of LLM calls; mode=batch is one model call for a whole micro-batch.", ("mode", "outcome"))
+llm_tokens = Counter("llm_tokens_total", "Tokens sent to (input) and generated by (output) the LLM.", ("direction",))
+
+def _create_llm():
+    # Check for the GOOGLE_API_KEY
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise EnvironmentError("GOOGLE_API_KEY not found in .env file")
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # Initialize the Google Gemini model with the correct, official name
+    return ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest")
+
+# The client is only created when the first prompt is sent (or on warm-up)
+llm_component = register_component("llm", _create_llm)
+
+def get_llm():
+    return llm_component.get()
+
+# Limits for the async path. Every LLM call made through ask_llm_async shares
+# these, so a burst of chat traffic can't open an unbounded number of requests.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+ERROR_MESSAGE = "Sorry, I ran into an error while trying to respond."
+
+# Response cache settings. The exact cache is keyed by the prompt itself; the
+# semantic cache matches prompts whose embeddings are close enough to one seen before.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_SEMANTIC_CACHE_SIZE = int(os.getenv("LLM_SEMANTIC_CACHE_SIZE", "1024"))
+LLM_SEMANTIC_THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.92"))
+
+exact_cache = TTLCache(max_size=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL_SECONDS)
+_semantic_cache = None
+
+# Micro-batching: prompts arriving within LLM_BATCH_MAX_WAIT_MS of each other are sent
+# through the model's batch API together, up to LLM_BATCH_MAX_SIZE at a time.
+# Off by default, since it only pays off with a backend whose batch call is
+# cheaper than the same number of single calls.
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "false").lower() == "true"
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "10"))
+_batcher = None
+
+
+class LLMOverloadedError(RuntimeError):
+    """Raised when the wait queue for the LLM is already full."""
+
+
+_semaphore = None
+_waiting = 0
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Created on first use so it binds to the running event loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _prompt_key(prompt_text: str) -> str:
+    return hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+
+
+def _embed_prompt(prompt_text: str):
+    # Imported here so the LLM service doesn't pull in the embedding model
+    # (and the vector store) unless the semantic cache is actually used
+    from ..vectorstore.document_embedder import get_model
+    return get_model().encode(prompt_text, normalize_embeddings=True)
+
+
+def _get_semantic_cache() -> SemanticCache:
+    global _semantic_cache
+    if _semantic_cache is None:
+        from ..vectorstore.document_embedder import get_model
+        _semantic_cache = SemanticCache(
+            dimension=get_model().get_sentence_embedding_dimension(),
+            max_size=LLM_SEMANTIC_CACHE_SIZE,
+            ttl=LLM_CACHE_TTL_SECONDS,
+            threshold=LLM_SEMANTIC_THRESHOLD,
+        )
+    return _semantic_cache
+
+
+def _get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            _dispatch_batch,
+            max_batch=LLM_BATCH_MAX_SIZE,
+            max_wait=LLM_BATCH_MAX_WAIT_MS / 1000,
+            max_pending=LLM_MAX_QUEUE,
+        )
+    return _batcher
+
+
+async def _dispatch_batch(prompts):
+    """
+    Sends a batch of prompts in one abatch call. abatch may run the prompts
+    concurrently, so the batch holds one LLM slot per prompt in flight: it
+    waits for one slot, takes whichever others are free without waiting (so
+    batches can't deadlock on each other), and limits abatch to that many.
+    """
+    async with _llm_slot():
+        semaphore = _get_semaphore()
+        extra = 0
+        while extra < len(prompts) - 1 and not semaphore.locked():
+            # Returns at once: a slot is free and nobody is queued for it
+            await semaphore.acquire()
+            extra += 1
+        try:
+            start = time.perf_counter()
+            responses = await asyncio.wait_for(
+                get_llm().abatch(prompts, config={"max_concurrency": extra + 1}, return_exceptions=True),
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+            llm_seconds.observe(time.perf_counter() - start, mode="batch", outcome="ok")
+        finally:
+            for _ in range(extra):
+                semaphore.release()
+    for response in responses:
+        _record_usage(response)
+    return [r if isinstance(r, BaseException) else r.content for r in responses]
+
+
+def batch_stats() -> dict:
+    return {"enabled": LLM_BATCH_ENABLED, **(_batcher.stats() if _batcher is not None else {})}
+
+
+def cache_stats() -> dict:
+    """Returns hit/miss counters and sizes for both cache levels."""
+    return {
+        "enabled": LLM_CACHE_ENABLED,
+        "exact": exact_cache.stats(),
+        "semantic": _semantic_cache.stats() if _semantic_cache is not None else None,
+    }
+
+
+def clear_cache():
+    exact_cache.clear()
+    if _semantic_cache is not None:
+        _semantic_cache.clear()
+
+
+def _record_usage(message):
+    # Models that report usage attach it to the response (or the last streamed chunk)
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        llm_tokens.inc(usage.get("input_tokens", 0), direction="input")
+        llm_tokens.inc(usage.get("output_tokens", 0), direction="output")
 
-# Initialize the Google Gemini model with the correct, official name
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest")
 
 def ask_llm(prompt_text: str) -> str:
     """
     A simple function to send a prompt to the LLM and get a response.
     """
+    start = time.perf_counter()
+    with span("ask_llm"):
+        try:
+            response = get_llm().invoke(prompt_text)
+        except Exception:
+            llm_seconds.observe(time.perf_counter() - start, mode="sync", outcome="error")
+            logger.exception("LLM call failed")
+            return ERROR_MESSAGE
+    llm_seconds.observe(time.perf_counter() - start, mode="sync", outcome="ok")
+    _record_usage(response)
+    return response.content
+
+
+async def _cache_lookup(prompt_text: str, semantic: bool):
+    """Returns (key, embedding, cached_answer) for a prompt; cached_answer is None on a miss."""
+    key = _prompt_key(prompt_text)
+    cached = exact_cache.get(key)
+    if cached is not None:
+        return key, None, cached
+
+    embedding = None
+    if semantic and LLM_SEMANTIC_CACHE_SIZE > 0:
+        try:
+            embedding = await run_in_executor("embedding", _embed_prompt, prompt_text)
+            cached = _get_semantic_cache().get(embedding)
+        except ExecutorOverloadedError:
+            # The semantic cache is only an optimisation, so a busy pool just skips it
+            return key, None, None
+        except Exception as e:
+            # ... and so does an embedding model that can't be loaded
+            logger.warning("Semantic cache lookup failed (%s), treating it as a miss", e)
+            return key, None, None
+        if cached is not None:
+            exact_cache.set(key, cached)
+    return key, embedding, cached
+
+
+def _cache_store(key: str, embedding, answer: str):
+    # Never cache the fallback message, the next attempt may well succeed
+    if answer == ERROR_MESSAGE:
+        return
+    exact_cache.set(key, answer)
+    if embedding is not None:
+        _get_semantic_cache().set(embedding, answer)
+
+
+async def ask_llm_async(
+    prompt_text: str,
+    timeout: float = None,
+    use_cache: bool = True,
+    semantic: bool = False,
+    lane: str = "default",
+) -> str:
+    """
+    Async version of ask_llm that doesn't block the event loop.
+    Answers are served from the exact-prompt cache when possible, and from the
+    semantic cache as well when `semantic` is set. Pass use_cache=False to bypass both.
+    `lane` names the kind of traffic ("chat", "policy", ...) so micro-batching
+    can share batches fairly between them.
+    """
+    with span("ask_llm", lane=lane):
+        if not (use_cache and LLM_CACHE_ENABLED):
+            return await _call_llm(prompt_text, timeout, lane)
+
+        with span("llm_cache_lookup") as current:
+            key, embedding, cached = await _cache_lookup(prompt_text, semantic)
+            if current is not None:
+                current.attributes["hit"] = cached is not None
+        if cached is not None:
+            return cached
+
+        answer = await _call_llm(prompt_text, timeout, lane)
+        _cache_store(key, embedding, answer)
+        return answer
+
+
+async def stream_llm(
+    prompt_text: str,
+    timeout: float = None,
+    use_cache: bool = True,
+    semantic: bool = False,
+):
+    """
+    Yields the model's answer piece by piece as it is generated.
+    A cached answer is yielded in one piece. The whole stream shares one
+    timeout, and LLMOverloadedError is raised before anything is yielded.
+    """
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    key = embedding = None
+    if use_cache:
+        key, embedding, cached = await _cache_lookup(prompt_text, semantic)
+        if cached is not None:
+            yield cached
+            return
+
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    parts = []
+    # Timed by hand: a span can't stay open across yields, which may resume in another task
+    async with _llm_slot():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        chunks = get_llm().astream(prompt_text).__aiter__()
+        try:
+            while True:
+                remaining = max(deadline - loop.time(), 0)
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                _record_usage(chunk)
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except StopAsyncIteration:
+            llm_seconds.observe(loop.time() - start, mode="stream", outcome="ok")
+        except asyncio.TimeoutError:
+            llm_seconds.observe(loop.time() - start, mode="stream", outcome="timeout")
+            logger.warning("LLM stream timed out after %s seconds", timeout)
+            if not parts:
+                yield ERROR_MESSAGE
+            return
+        except Exception:
+            llm_seconds.observe(loop.time() - start, mode="stream", outcome="error")
+            logger.exception("LLM stream failed")
+            if not parts:
+                yield ERROR_MESSAGE
+            return
+
+    if use_cache and parts:
+        _cache_store(key, embedding, "".join(parts))
+
+
+@asynccontextmanager
+async def _llm_slot():
+    """
+    Holds one of the LLM_MAX_CONCURRENCY slots. Up to LLM_MAX_QUEUE callers
+    may wait for a slot; beyond that LLMOverloadedError is raised.
+    """
+    global _waiting
+    semaphore = _get_semaphore()
+
+    if semaphore.locked():
+        if _waiting >= LLM_MAX_QUEUE:
+            raise LLMOverloadedError("Too many requests are waiting for the LLM, please try again later.")
+        _waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            _waiting -= 1
+    else:
+        await semaphore.acquire()
+
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+async def _call_llm(prompt_text: str, timeout: float = None, lane: str = "default") -> str:
+    """Sends one prompt to the model, through the micro-batcher when it is enabled."""
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    mode = "batched" if LLM_BATCH_ENABLED else "async"
+    start = time.perf_counter()
     try:
-        response = llm.invoke(prompt_text)
-        return response.content
-    except Exception as e:
-        print("--- AN ERROR OCCURRED ---")
-        traceback.print_exc()
-        print("-------------------------")
-        return "Sorry, I ran into an error while trying to respond."
\ No newline at end of file
+        with span("llm_call"):
+            if LLM_BATCH_ENABLED:
+                try:
+                    answer = await asyncio.wait_for(_get_batcher().submit(prompt_text, lane), timeout=timeout)
+                except OverflowError as e:
+                    raise LLMOverloadedError(str(e))
+            else:
+                async with _llm_slot():
+                    start = time.perf_counter()
+                    response = await asyncio.wait_for(get_llm().ainvoke(prompt_text), timeout=timeout)
+                _record_usage(response)
+                answer = response.content
+    except LLMOverloadedError:
+        raise
+    except asyncio.TimeoutError:
+        llm_seconds.observe(time.perf_counter() - start, mode=mode, outcome="timeout")
+        logger.warning("LLM call timed out after %s seconds", timeout)
+        return ERROR_MESSAGE
+    except Exception:
+        llm_seconds.observe(time.perf_counter() - start, mode=mode, outcome="error")
+        logger.exception("LLM call failed")
+        return ERROR_MESSAGE
+    llm_seconds.observe(time.perf_counter() - start, mode=mode, outcome="ok")
+    return answer
@@ -0,0 +1,220 @@
+import contextvars
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# Metrics are cheap enough to leave on; with both switches off, recording is a flag check
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Tracing keeps the span tree of the last TRACE_BUFFER_SIZE requests in memory
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+
+# Seconds, from a cache hit up to a slow LLM answer
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+registry = {}
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _merge(self, key, value):
+        self._values[key] = self._values.get(key, 0) + value
+
+    def _lines(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{self._label_text(key)} {value}"
+
+
+class Histogram(_Metric):
+    """Counts observations per bucket (value <= upper bound), plus their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf) and the sum of all values
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge(self, key, value):
+        state = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+        state[0] = [a + b for a, b in zip(state[0], value[0])]
+        state[1] += value[1]
+
+    def _lines(self):
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{self._label_text(key, le)} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(key)} {total}"
+            yield f"{self.name}_count{self._label_text(key)} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        with metric._lock:
+            lines.extend(metric._lines())
+    return "\n".join(lines) + "\n"
+
+
+def take_snapshot() -> dict:
+    """
+    Returns and clears everything recorded in this process. Worker processes
+    send it back with each result so the API process can merge it.
+    """
+    snapshot = {}
+    for name, metric in registry.items():
+        with metric._lock:
+            if metric._values:
+                snapshot[name], metric._values = metric._values, {}
+    return snapshot
+
+
+def merge_snapshot(snapshot: dict):
+    for name, values in snapshot.items():
+        metric = registry.get(name)
+        if metric is None:
+            continue
+        with metric._lock:
+            for key, value in values.items():
+                metric._merge(key, value)
+
+
+# --- Tracing ---
+
+stage_seconds = Histogram("stage_seconds", "Time spent in each traced stage of a request.", ("stage",))
+traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_current_span = contextvars.ContextVar("current_span", default=None)
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "attributes", "children")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.attributes = attributes or {}
+        self.children = []
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+@contextmanager
+def span(name: str, traceparent: str = None, **attributes):
+    """
+    Times one stage of the work, recorded in stage_seconds under `name`. With
+    TRACING_ENABLED the stage also becomes a span nested under the current
+    one; spans started outside any other (or continuing an incoming W3C
+    `traceparent`) are kept in `traces` once they finish.
+    """
+    if not TRACING_ENABLED:
+        if not METRICS_ENABLED:
+            yield None
+            return
+        start = time.perf_counter()
+        try:
+            yield None
+        finally:
+            stage_seconds.observe(time.perf_counter() - start, stage=name)
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        current = Span(name, parent.trace_id, parent.span_id, attributes)
+        parent.children.append(current)
+    else:
+        match = _TRACEPARENT.match(traceparent or "")
+        trace_id, remote_parent = match.groups() if match else (uuid.uuid4().hex, None)
+        current = Span(name, trace_id, remote_parent, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        stage_seconds.observe(current.duration, stage=name)
+        if parent is None:
+            traces.append(current)
+
+
+def recent_traces(limit: int = 20) -> list:
+    return [trace.to_dict() for trace in list(traces)[-limit:][::-1]]
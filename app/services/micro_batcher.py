@@ -0,0 +1,110 @@
+import asyncio
+from collections import OrderedDict, deque
+
+
+class MicroBatcher:
+    """
+    Collects individual requests for up to `max_wait` seconds (or until
+    `max_batch` are waiting) and hands them to `dispatch` as one batch.
+    `dispatch` receives a list of items and must return a list of results (or
+    exceptions) in the same order; each result is routed back to its caller.
+
+    Requests are queued per lane (e.g. "chat" and "policy"), and batches are
+    filled round-robin across lanes so a burst in one lane can't starve another.
+    """
+
+    def __init__(self, dispatch, max_batch: int = 16, max_wait: float = 0.01, max_pending: int = None):
+        self.dispatch = dispatch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.batches = 0
+        self.batched_items = 0
+        self._lanes = OrderedDict()
+        self._pending = 0
+        self._wakeup = None
+        self._runner = None
+        # The event loop only keeps weak references to tasks, so in-flight dispatches are held here
+        self._dispatches = set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def submit(self, item, lane: str = "default"):
+        """Queues one item and waits for its result."""
+        self._ensure_runner()
+        if self.max_pending is not None and self._pending >= self.max_pending:
+            raise OverflowError("Too many requests are waiting to be batched.")
+        future = asyncio.get_running_loop().create_future()
+        self._lanes.setdefault(lane, deque()).append((item, future))
+        self._pending += 1
+        self._wakeup.set()
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "batches": self.batches,
+            "average_batch_size": round(self.batched_items / self.batches, 2) if self.batches else None,
+        }
+
+    def _ensure_runner(self):
+        # Started from inside the event loop on first use
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            # Give other requests a moment to join the batch
+            deadline = loop.time() + self.max_wait
+            while self._pending < self.max_batch and loop.time() < deadline:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+            batch = self._take_batch()
+            if not self._pending:
+                self._wakeup.clear()
+            if batch:
+                task = asyncio.create_task(self._dispatch(batch))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    def _take_batch(self):
+        batch = []
+        while len(batch) < self.max_batch and self._pending:
+            for lane in list(self._lanes):
+                queue = self._lanes[lane]
+                if not queue:
+                    del self._lanes[lane]
+                    continue
+                item, future = queue.popleft()
+                self._pending -= 1
+                # The lane just served goes to the back for the next pick
+                self._lanes.move_to_end(lane)
+                # Callers that timed out or went away don't take up a batch slot
+                if not future.done():
+                    batch.append((item, future))
+                if len(batch) >= self.max_batch:
+                    break
+        return batch
+
+    async def _dispatch(self, batch):
+        self.batches += 1
+        self.batched_items += len(batch)
+        try:
+            results = await self.dispatch([item for item, _ in batch])
+        except BaseException as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+import time
+from .executors import run_in_executor
+from .llm_service import ask_llm_async, get_llm
+
+# Rough size of a token in characters, good enough for budgeting English text
+CHARS_PER_TOKEN = 4
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "6"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_context(results, max_tokens: int):
+    """
+    Picks the highest scoring chunks that fit in `max_tokens`, skipping duplicates
+    (the same text stored under several documents, or a chunk contained in
+    another one already picked). Returns the chosen results in score order.
+    """
+    chosen, seen, used = [], set(), 0
+    for result in sorted(results, key=lambda r: r["score"], reverse=True):
+        text = result["text"].strip()
+        key = hashlib.sha256(" ".join(text.split()).lower().encode("utf-8")).hexdigest()
+        if key in seen or any(text in c["text"] for c in chosen):
+            continue
+        cost = estimate_tokens(text)
+        if used + cost > max_tokens:
+            # A smaller chunk further down may still fit
+            continue
+        seen.add(key)
+        chosen.append({**result, "text": text})
+        used += cost
+    return chosen
+
+
+def build_rag_prompt(question: str, context) -> str:
+    sources = "\n\n".join(
+        f"[{i + 1}] ({c.get('document_id') or 'unknown'})\n{c['text']}" for i, c in enumerate(context)
+    )
+    return f"""
+    You are a smart city assistant. Answer the citizen's question using the city documents below.
+    If they don't contain the answer, say so and answer from general knowledge, making that clear.
+
+    Documents:
+    {sources}
+
+    Question:
+    {question}
+
+    Answer:
+    """
+
+
+async def retrieve_context(question: str, top_k: int, context_tokens: int, metadata_filter: dict, timings: dict):
+    """Embeds the question, searches the index and packs the results, recording stage timings."""
+    # Imported here so the chat service doesn't load the vector store until RAG is used
+    from ..vectorstore.document_retriever import embed_queries, search_by_embedding
+
+    # 1. Embed the question (cached for repeated questions)
+    stage = time.perf_counter()
+    embedding = (await run_in_executor("embedding", embed_queries, [question]))[0]
+    timings["embed_ms"] = round((time.perf_counter() - stage) * 1000, 1)
+
+    # 2. Search the index
+    stage = time.perf_counter()
+    results = await asyncio.to_thread(search_by_embedding, embedding, top_k, metadata_filter)
+    timings["search_ms"] = round((time.perf_counter() - stage) * 1000, 1)
+
+    # 3. Keep the best chunks that fit in the context budget
+    return pack_context(results, context_tokens)
+
+
+async def prepare_context_prompt(
+    question: str, top_k: int, context_tokens: int, metadata_filter: dict, timings: dict
+) -> tuple:
+    """Retrieves context for a question and returns (prompt, context chunks)."""
+    # Retrieval runs alongside creating the LLM client, which is slow the first
+    # time when it wasn't warmed up at startup
+    context, _ = await asyncio.gather(
+        retrieve_context(question, top_k, context_tokens, metadata_filter, timings),
+        asyncio.to_thread(get_llm),
+    )
+    return build_rag_prompt(question, context), context
+
+
+async def ask_with_context(
+    question: str,
+    top_k: int = RAG_TOP_K,
+    context_tokens: int = RAG_CONTEXT_TOKENS,
+    metadata_filter: dict = None,
+    use_cache: bool = True,
+) -> dict:
+    """
+    Answers a question with relevant document chunks added to the prompt.
+    Returns the answer, the chunks used and the time spent in each stage (ms).
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    prompt, context = await prepare_context_prompt(question, top_k, context_tokens, metadata_filter, timings)
+
+    stage = time.perf_counter()
+    answer = await ask_llm_async(prompt, use_cache=use_cache, lane="chat")
+    timings["generate_ms"] = round((time.perf_counter() - stage) * 1000, 1)
+
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return {"response": answer, "sources": context, "timings": timings}
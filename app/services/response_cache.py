@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TTLCache:
+    """
+    A small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    A ttl of None keeps entries until they are evicted by size.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class SemanticCache:
+    """
+    Stores answers next to the normalized embedding of the prompt that produced them.
+    A lookup returns the stored answer whose prompt embedding has the highest cosine
+    similarity with the new one, provided it is at least `threshold`.
+    When full, the least recently used entry is overwritten.
+    """
+
+    def __init__(self, dimension: int, max_size: int = 1024, ttl: float = None, threshold: float = 0.92):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.zeros((max_size, dimension), dtype=np.float32)
+        self._expires_at = np.full(max_size, np.inf)
+        self._last_used = np.zeros(max_size)
+        self._answers = [None] * max_size
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def get(self, embedding):
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self._count == 0:
+                self.misses += 1
+                return None
+            now = time.monotonic()
+            scores = self._vectors[:self._count] @ query
+            scores[self._expires_at[:self._count] < now] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self._last_used[best] = now
+            self.hits += 1
+            return self._answers[best]
+
+    def set(self, embedding, answer: str):
+        if self.max_size <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._count < self.max_size:
+                slot = self._count
+                self._count += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = embedding
+            self._expires_at[slot] = now + self.ttl if self.ttl else np.inf
+            self._last_used[slot] = now
+            self._answers[slot] = answer
+
+    def clear(self):
+        with self._lock:
+            self._count = 0
+            self._answers = [None] * self.max_size
+
+    def __len__(self):
+        return self._count
+
+    def stats(self) -> dict:
+        return {
+            "size": self._count,
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import os
+from .llm_service import ask_llm_async, ERROR_MESSAGE
+from .response_cache import TTLCache
+
+# Target size of one section; documents longer than this are summarized map-reduce style
+SECTION_MAX_CHARS = int(os.getenv("SECTION_MAX_CHARS", "8000"))
+SECTION_MIN_CHARS = SECTION_MAX_CHARS // 4
+# Section summaries requested from the LLM at the same time, per document
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+SECTION_CACHE_SIZE = int(os.getenv("SECTION_CACHE_SIZE", "10000"))
+# Extra attempts for a section whose summary request failed
+SECTION_RETRIES = int(os.getenv("SECTION_RETRIES", "1"))
+
+# Section summaries by content hash, so an edited policy only re-summarizes changed sections
+section_summary_cache = TTLCache(max_size=SECTION_CACHE_SIZE)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_sections(text: str, max_chars: int = SECTION_MAX_CHARS):
+    """
+    Splits a document into sections of whole paragraphs.
+    Boundaries depend on the paragraphs' content rather than on absolute
+    positions: a section ends after a paragraph whose hash has a particular
+    bit pattern (once the section is past SECTION_MIN_CHARS), or when it would
+    grow past max_chars. Editing one clause therefore only changes the section
+    containing it, not every section after it.
+    """
+    min_chars = min(SECTION_MIN_CHARS, max_chars // 4)
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    sections, current, size = [], [], 0
+    for paragraph in paragraphs:
+        # Very long paragraphs are cut into max_chars pieces of their own
+        while len(paragraph) > max_chars:
+            if current:
+                sections.append("\n\n".join(current))
+                current, size = [], 0
+            sections.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and size + len(paragraph) > max_chars:
+            sections.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph)
+        if size >= min_chars and int(_hash(paragraph)[:2], 16) % 4 == 0:
+            sections.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def build_section_prompt(section: str) -> str:
+    return f"""
+    You are a smart city assistant. Summarize this section of a city policy document
+    in a few plain sentences, keeping any rules, dates, amounts and who they apply to.
+
+    Section:
+    {section}
+
+    Summary:
+    """
+
+
+def build_merge_prompt(summaries) -> str:
+    joined = "\n\n".join(f"- {s}" for s in summaries)
+    return f"""
+    You are a smart city assistant. Below are summaries of consecutive sections of one policy document.
+    Combine them into a single summary in simple, clear language for a citizen.
+    Keep it concise and under 100 words.
+
+    Section summaries:
+    {joined}
+
+    Summary:
+    """
+
+
+async def summarize_sections(text: str, use_cache: bool = True) -> dict:
+    """
+    The map and reduce steps of summarize_long_document: sections are
+    summarized concurrently (at most SUMMARY_MAX_CONCURRENCY at a time), and
+    the partial summaries are merged in rounds until one prompt can hold them.
+    Returns {"summaries", "sections", "cached_sections"}; "summaries" is None
+    when a section still failed after SECTION_RETRIES extra attempts, so the
+    error text is never merged in as a section summary.
+    """
+    semaphore = asyncio.Semaphore(SUMMARY_MAX_CONCURRENCY)
+    cached_sections = 0
+
+    async def summarize_section(section: str, count_cached: bool = True) -> str:
+        nonlocal cached_sections
+        key = _hash(section)
+        if use_cache:
+            cached = section_summary_cache.get(key)
+            if cached is not None:
+                cached_sections += count_cached
+                return cached
+        for _ in range(SECTION_RETRIES + 1):
+            async with semaphore:
+                # The section cache replaces the generic response cache here
+                summary = await ask_llm_async(build_section_prompt(section), use_cache=False, lane="policy")
+            if summary != ERROR_MESSAGE:
+                section_summary_cache.set(key, summary)
+                break
+        return summary
+
+    sections = split_sections(text)
+    summaries = await asyncio.gather(*(summarize_section(s) for s in sections))
+
+    # Reduce: merge groups of summaries until one prompt can hold them all
+    while ERROR_MESSAGE not in summaries and len("\n\n".join(summaries)) > SECTION_MAX_CHARS and len(summaries) > 1:
+        groups, group, size = [], [], 0
+        for summary in summaries:
+            if group and size + len(summary) > SECTION_MAX_CHARS:
+                groups.append(group)
+                group, size = [], 0
+            group.append(summary)
+            size += len(summary)
+        groups.append(group)
+        if len(groups) == len(summaries):
+            break
+        summaries = await asyncio.gather(
+            *(summarize_section("\n\n".join(g), count_cached=False) for g in groups)
+        )
+
+    return {
+        "summaries": None if ERROR_MESSAGE in summaries else summaries,
+        "sections": len(sections),
+        "cached_sections": cached_sections,
+    }
+
+
+async def summarize_long_document(text: str, use_cache: bool = True) -> dict:
+    """
+    Map-reduce summarization: the sections' summaries from summarize_sections
+    are combined into one in a final LLM call.
+    """
+    partial = await summarize_sections(text, use_cache)
+    stats = {"sections": partial["sections"], "cached_sections": partial["cached_sections"]}
+    if partial["summaries"] is None:
+        return {"summary": ERROR_MESSAGE, **stats}
+    final = await ask_llm_async(build_merge_prompt(partial["summaries"]), use_cache=use_cache, lane="policy")
+    return {"summary": final, **stats}
@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+from pathlib import Path
+from .embedding_backend import EMBEDDING_MODEL, EMBEDDING_STORAGE, from_blob, to_blob
+from .pinecone_client import index_location
+from ..services.components import register_component
+
+# Define the path for the chunk manifest
+DATA_DIR = Path("app/data")
+MANIFEST_DB = DATA_DIR / "chunk_manifest.db"
+
+DOCUMENT_CHUNKS_SCHEMA = """
+-- Which vectors each document currently has in the index, per index and model (the scope)
+CREATE TABLE IF NOT EXISTS document_chunks (
+    scope TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    vector_id TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    PRIMARY KEY (scope, document_id, vector_id)
+) WITHOUT ROWID;
+"""
+
+SCHEMA = DOCUMENT_CHUNKS_SCHEMA + """
+-- Embeddings by chunk content, shared by every document containing that chunk
+CREATE TABLE IF NOT EXISTS chunk_embeddings (
+    chunk_hash TEXT PRIMARY KEY,
+    embedding BLOB NOT NULL,
+    format TEXT NOT NULL DEFAULT 'float32'
+) WITHOUT ROWID;
+"""
+
+
+def manifest_scope() -> str:
+    """Identifies the index, embedding model and storage format that recorded vectors belong to."""
+    return f"{index_location()}|{EMBEDDING_MODEL}|{EMBEDDING_STORAGE}"
+
+
+class ChunkManifest:
+    """
+    Remembers the content hash of every chunk stored for a document, and caches
+    embeddings by chunk hash so identical text is only ever embedded once.
+    Embeddings are written in `storage` (see EMBEDDING_STORAGE) and each row
+    remembers its format, so changing it doesn't invalidate the cache.
+
+    Document chunks are recorded per `scope` (see manifest_scope), so after
+    switching to another index or model a re-upload fills the new index
+    instead of being skipped as already stored.
+    """
+
+    def __init__(self, db_path: Path = MANIFEST_DB, storage: str = EMBEDDING_STORAGE, scope: str = None):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunk_embeddings)")}
+        if "format" not in columns:
+            # Caches written before EMBEDDING_STORAGE existed are all float32
+            self._conn.execute("ALTER TABLE chunk_embeddings ADD COLUMN format TEXT NOT NULL DEFAULT 'float32'")
+        self.storage = storage
+        self.scope = scope or manifest_scope()
+        self._migrate_unscoped_chunks()
+        self._lock = threading.Lock()
+
+    def _migrate_unscoped_chunks(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(document_chunks)")}
+        if "scope" in columns:
+            return
+        # Rows from before scopes were recorded belong to the index and model in use now
+        with self._conn:
+            self._conn.execute("ALTER TABLE document_chunks RENAME TO document_chunks_unscoped")
+            self._conn.execute(DOCUMENT_CHUNKS_SCHEMA)
+            self._conn.execute(
+                "INSERT INTO document_chunks (scope, document_id, vector_id, chunk_hash) "
+                "SELECT ?, document_id, vector_id, chunk_hash FROM document_chunks_unscoped",
+                (self.scope,),
+            )
+            self._conn.execute("DROP TABLE document_chunks_unscoped")
+
+    def document_vector_ids(self, document_id: str) -> set:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector_id FROM document_chunks WHERE scope = ? AND document_id = ?", (self.scope, document_id)
+            ).fetchall()
+        return {vector_id for (vector_id,) in rows}
+
+    def replace_document(self, document_id: str, chunks: dict):
+        """Records `chunks` ({vector_id: chunk_hash}) as the document's full set of vectors."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM document_chunks WHERE scope = ? AND document_id = ?", (self.scope, document_id)
+            )
+            self._conn.executemany(
+                "INSERT INTO document_chunks (scope, document_id, vector_id, chunk_hash) VALUES (?, ?, ?, ?)",
+                [(self.scope, document_id, vector_id, chunk_hash) for vector_id, chunk_hash in chunks.items()],
+            )
+
+    def get_embeddings(self, chunk_hashes) -> dict:
+        """Returns {chunk_hash: embedding list} for the hashes that are cached."""
+        chunk_hashes = list(chunk_hashes)
+        if not chunk_hashes:
+            return {}
+        placeholders = ",".join("?" * len(chunk_hashes))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_hash, embedding, format FROM chunk_embeddings WHERE chunk_hash IN ({placeholders})",
+                chunk_hashes,
+            ).fetchall()
+        return {chunk_hash: from_blob(blob, storage).tolist() for chunk_hash, blob, storage in rows}
+
+    def put_embeddings(self, embeddings: dict):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_embeddings (chunk_hash, embedding, format) VALUES (?, ?, ?)",
+                [
+                    (chunk_hash, to_blob(values, self.storage), self.storage)
+                    for chunk_hash, values in embeddings.items()
+                ],
+            )
+
+
+# The database is only opened on first use, so importing the app creates no files
+manifest_component = register_component("chunk_manifest", ChunkManifest)
+
+def get_manifest() -> ChunkManifest:
+    return manifest_component.get()
+
+def __getattr__(name):
+    # Keeps `chunk_manifest.manifest` working without opening the database at import time
+    if name == "manifest":
+        return get_manifest()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
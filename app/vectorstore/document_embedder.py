@@ -1,34 +1,262 @@
-from sentence_transformers import SentenceTransformer
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from .pinecone_client import index
+import asyncio
+import codecs
+import hashlib
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from .pinecone_client import get_index
+from .chunk_manifest import get_manifest
+from .embedding_backend import DEFAULT_MODEL, EMBEDDING_MODEL, create_model
+from ..services.components import LazyComponent, register_component
+from ..services.executors import run_in_executor
+from ..services.metrics import Histogram, SIZE_BUCKETS, span
 
-# Initialize the sentence transformer model
-# This model creates 384-dimensional embeddings.
-model = SentenceTransformer('all-MiniLM-L6-v2')
+logger = logging.getLogger(__name__)
 
-def process_and_embed_document(document_text: str, document_id: str):
+# kind is "document" for ingestion and "query" for searches
+embedding_batch_size = Histogram("embedding_batch_size", "Texts per embedding model call.", ("kind",), SIZE_BUCKETS)
+embedding_seconds = Histogram("embedding_seconds", "Duration of embedding model calls.", ("kind",))
+vector_write_seconds = Histogram("vector_write_seconds", "Duration of index upsert and delete requests.", ("operation",))
+
+def _create_text_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+# Loading the model takes seconds, so it happens on first use (or on warm-up)
+model_component = register_component("embedding_model", create_model)
+# The splitter is stateless, so one instance is shared by every upload
+text_splitter_component = LazyComponent("text_splitter", _create_text_splitter)
+
+def get_model():
+    return model_component.get()
+
+def __getattr__(name):
+    # Keeps `document_embedder.model` working without loading it at import time
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Ingestion pipeline settings
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+MAX_PENDING_UPSERTS = int(os.getenv("MAX_PENDING_UPSERTS", "2"))
+UPSERT_RETRIES = int(os.getenv("UPSERT_RETRIES", "3"))
+
+# Text is split one segment at a time so large documents are never split in one go
+SEGMENT_SIZE = 64 * 1024
+READ_BLOCK_SIZE = 256 * 1024
+
+_upsert_executor = ThreadPoolExecutor(max_workers=MAX_PENDING_UPSERTS, thread_name_prefix="upsert")
+
+
+def iter_text(binary_file, encoding: str = "utf-8"):
+    """Yields decoded text from a binary file one block at a time."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while block := binary_file.read(READ_BLOCK_SIZE):
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_chunks(pieces):
+    """
+    Yields chunks from an iterable of text pieces (e.g. blocks read from a file).
+    Text is buffered up to SEGMENT_SIZE and cut at the last paragraph or line
+    break, and each segment is split on its own.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= SEGMENT_SIZE:
+            cut = buffer.rfind("\n\n", 0, SEGMENT_SIZE)
+            if cut <= 0:
+                cut = buffer.rfind("\n", 0, SEGMENT_SIZE)
+            if cut <= 0:
+                cut = SEGMENT_SIZE
+            yield from text_splitter_component.get().split_text(buffer[:cut])
+            buffer = buffer[cut:]
+    if buffer.strip():
+        yield from text_splitter_component.get().split_text(buffer)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _encode(chunks):
+    embedding_batch_size.observe(len(chunks), kind="document")
+    with embedding_seconds.time(kind="document"):
+        return get_model().encode(chunks, batch_size=EMBED_BATCH_SIZE).tolist()
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+def _cache_key(h: str) -> str:
+    # Embeddings of different models don't mix. The default model keeps plain
+    # hashes so caches from before EMBEDDING_MODEL existed stay valid
+    return h if EMBEDDING_MODEL == DEFAULT_MODEL else f"{EMBEDDING_MODEL}:{h}"
+
+
+def _embed_with_cache(chunks, hashes):
+    """Embeds chunks, reusing cached embeddings for chunk hashes seen before."""
+    keys = [_cache_key(h) for h in hashes]
+    cached = get_manifest().get_embeddings(keys)
+    missing = [(chunk, key) for chunk, key in zip(chunks, keys) if key not in cached]
+    if missing:
+        fresh = dict(zip([key for _, key in missing], _encode([chunk for chunk, _ in missing])))
+        get_manifest().put_embeddings(fresh)
+        cached.update(fresh)
+    return [cached[key] for key in keys], len(missing)
+
+
+def _upsert_with_retry(vectors):
+    """Upserts vectors in UPSERT_BATCH_SIZE requests, retrying each with backoff."""
+    for batch in _batched(vectors, UPSERT_BATCH_SIZE):
+        with vector_write_seconds.time(operation="upsert"):
+            _with_retry(get_index().upsert, vectors=batch)
+
+
+def _delete_with_retry(vector_ids):
+    for batch in _batched(vector_ids, UPSERT_BATCH_SIZE):
+        with vector_write_seconds.time(operation="delete"):
+            _with_retry(get_index().delete, ids=batch)
+
+
+def _legacy_vector_ids(document_id: str) -> list:
+    """
+    IDs of the document's vectors stored under the old positional scheme,
+    {document_id}-{chunk number}. They were never recorded in the manifest, so
+    they are listed from the index by prefix (Pinecone serverless and the
+    local index support this).
+    """
+    prefix = f"{document_id}-"
+    try:
+        pages = list(get_index().list(prefix=prefix))
+    except Exception as e:
+        logger.warning("Could not list vectors of '%s' to remove positional IDs: %s", document_id, e)
+        return []
+    # Content-keyed IDs end in 16 hex digits; positional ones in a short chunk number
+    return [
+        vector_id for page in pages for vector_id in page
+        if vector_id[len(prefix):].isdigit() and len(vector_id) - len(prefix) < 16
+    ]
+
+
+def _with_retry(call, **kwargs):
+    for attempt in range(UPSERT_RETRIES + 1):
+        try:
+            return call(**kwargs)
+        except Exception as e:
+            if attempt == UPSERT_RETRIES:
+                raise
+            delay = 0.5 * 2 ** attempt
+            logger.warning("Index request failed (%s), retrying in %ss", e, delay)
+            time.sleep(delay)
+
+
+_document_locks = defaultdict(asyncio.Lock)
+
+
+async def process_and_embed_document(document, document_id: str, on_progress=None):
     """
     Splits a document, creates embeddings, and upserts them to Pinecone.
+    `document` is either the full text or an iterable of text pieces.
+
+    Vectors are identified by the hash of their chunk, so re-uploading a document
+    only embeds and upserts chunks that changed, and vectors for chunks that are
+    gone are deleted. Unchanged uploads don't touch the index at all.
+    Chunks are embedded in batches on a worker pool, and each batch is upserted
+    while the next one is being embedded. `on_progress`, if given, is called
+    with the number of chunks processed so far after every batch.
+
+    Returns a dict with the number of chunks in the document and how many were
+    embedded, upserted and deleted.
     """
-    # 1. Split the document into manageable chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_text(document_text)
-
-    # 2. Create numerical embeddings for each chunk
-    embeddings = model.encode(chunks).tolist()
-
-    # 3. Prepare vectors in the format Pinecone expects
-    vectors = []
-    for i, chunk in enumerate(chunks):
-        vector = {
-            "id": f"{document_id}-{i}",
-            "values": embeddings[i],
-            "metadata": {"text": chunk, "document_id": document_id}
-        }
-        vectors.append(vector)
-    
-    # 4. Upload (upsert) the vectors to the Pinecone index
-    if vectors:
-        index.upsert(vectors=vectors)
-    
-    return len(vectors)
+    async with _document_locks[document_id]:
+        with span("process_and_embed_document", document_id=document_id) as current:
+            stats = await _process_document(document, document_id, on_progress)
+            if current is not None:
+                current.attributes.update(stats)
+            return stats
+
+
+async def _process_document(document, document_id, on_progress):
+    loop = asyncio.get_running_loop()
+    pieces = [document] if isinstance(document, str) else document
+
+    existing_ids = await asyncio.to_thread(get_manifest().document_vector_ids, document_id)
+    legacy_ids = []
+    if not existing_ids:
+        # A document not in the manifest may still have vectors from before chunks were keyed by content
+        legacy_ids = await loop.run_in_executor(_upsert_executor, _legacy_vector_ids, document_id)
+    current = {}
+    stats = {"chunks": 0, "embedded": 0, "upserted": 0, "deleted": 0}
+    pending = set()
+    try:
+        # 1. Split the document into manageable chunks, one batch at a time
+        for chunks in _batched(iter_chunks(pieces), EMBED_BATCH_SIZE):
+            stats["chunks"] += len(chunks)
+
+            # 2. Keep only chunks that aren't in the index yet
+            new_chunks, new_hashes, new_ids = [], [], []
+            for chunk in chunks:
+                h = chunk_hash(chunk)
+                vector_id = f"{document_id}-{h[:16]}"
+                if vector_id in current:
+                    continue
+                current[vector_id] = h
+                if vector_id not in existing_ids:
+                    new_chunks.append(chunk)
+                    new_hashes.append(h)
+                    new_ids.append(vector_id)
+
+            if new_chunks:
+                # 3. Create numerical embeddings on the embedding pool, skipping cached ones.
+                # Ingestion is already limited by the job workers, so it waits rather than fails
+                with span("embed_batch", chunks=len(new_chunks)):
+                    embeddings, embedded = await run_in_executor(
+                        "embedding", _embed_with_cache, new_chunks, new_hashes, bounded=False
+                    )
+                stats["embedded"] += embedded
+
+                # 4. Prepare vectors in the format Pinecone expects
+                vectors = [
+                    {
+                        "id": new_ids[i],
+                        "values": embeddings[i],
+                        "metadata": {"text": chunk, "document_id": document_id}
+                    }
+                    for i, chunk in enumerate(new_chunks)
+                ]
+                stats["upserted"] += len(vectors)
+
+                # 5. Upsert in the background, but don't let upserts pile up in memory
+                if len(pending) >= MAX_PENDING_UPSERTS:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                pending.add(loop.run_in_executor(_upsert_executor, _upsert_with_retry, vectors))
+
+            if on_progress is not None:
+                on_progress(stats["chunks"])
+    except BaseException:
+        # Let in-flight upserts settle before giving up
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
+    await asyncio.gather(*pending)
+
+    # 6. Remove vectors of chunks that are no longer in the document
+    orphaned = sorted(existing_ids - current.keys()) + legacy_ids
+    if orphaned:
+        await loop.run_in_executor(_upsert_executor, _delete_with_retry, orphaned)
+        stats["deleted"] = len(orphaned)
+    if orphaned or stats["upserted"]:
+        await asyncio.to_thread(get_manifest().replace_document, document_id, current)
+
+    return stats
@@ -1,32 +1,114 @@
-from .document_embedder import model  # Reuse the same embedding model
-from .pinecone_client import index
+import asyncio
+import logging
+import os
+import time
+from .document_embedder import EMBED_BATCH_SIZE, get_model, embedding_batch_size, embedding_seconds  # Reuse the same embedding model
+from .pinecone_client import get_index
+from ..services.executors import run_in_executor, ExecutorOverloadedError
+from ..services.metrics import Histogram, span
+from ..services.response_cache import TTLCache
 
-def search_documents(query: str, top_k: int = 3):
+logger = logging.getLogger(__name__)
+
+vector_query_seconds = Histogram("vector_query_seconds", "Duration of vector index queries.", ("outcome",))
+
+# Recently seen queries skip the embedding model entirely
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+query_embedding_cache = TTLCache(max_size=QUERY_EMBEDDING_CACHE_SIZE)
+
+
+def embed_queries(queries):
     """
-    Takes a text query, embeds it, and searches Pinecone for the most similar vectors.
+    Returns one embedding per query, encoding all uncached queries in a single model call.
     """
-    try:
-        # 1. Create an embedding for the user's query
-        query_embedding = model.encode(query).tolist()
+    embeddings = [query_embedding_cache.get(query) for query in queries]
+    missing = sorted({query for query, embedding in zip(queries, embeddings) if embedding is None})
+    if missing:
+        embedding_batch_size.observe(len(missing), kind="query")
+        with embedding_seconds.time(kind="query"):
+            encoded = dict(zip(missing, get_model().encode(missing, batch_size=EMBED_BATCH_SIZE).tolist()))
+        for query, embedding in encoded.items():
+            query_embedding_cache.set(query, embedding)
+        embeddings = [embedding if embedding is not None else encoded[query] for query, embedding in zip(queries, embeddings)]
+    return embeddings
 
-        # 2. Query Pinecone for the top_k most similar vectors
-        results = index.query(
+
+def build_filter(document_id: str = None, metadata_filter: dict = None):
+    """Combines a document_id restriction with any other metadata filter."""
+    combined = dict(metadata_filter or {})
+    if document_id is not None:
+        combined["document_id"] = {"$eq": document_id}
+    return combined or None
+
+
+def search_by_embedding(query_embedding, top_k: int = 3, metadata_filter: dict = None, min_score: float = None):
+    """Queries the index with an already computed embedding."""
+    start = time.perf_counter()
+    try:
+        results = get_index().query(
             vector=query_embedding,
             top_k=top_k,
-            include_metadata=True
+            include_metadata=True,
+            filter=metadata_filter,
         )
-        
-        # 3. Extract the text from the metadata of the results
-        search_results = [
-            {
-                "text": match['metadata']['text'],
-                "score": match['score']
-            }
-            for match in results['matches']
-        ]
-        
-        return search_results
-    
-    except Exception as e:
-        print(f"An error occurred during search: {e}")
-        return []
+    except Exception:
+        vector_query_seconds.observe(time.perf_counter() - start, outcome="error")
+        raise
+    vector_query_seconds.observe(time.perf_counter() - start, outcome="ok")
+
+    # Extract the text from the metadata of the results
+    return [
+        {
+            "text": match['metadata']['text'],
+            "document_id": match['metadata'].get('document_id'),
+            "score": match['score']
+        }
+        for match in results['matches']
+        if min_score is None or match['score'] >= min_score
+    ]
+
+
+def search_documents(query: str, top_k: int = 3, metadata_filter: dict = None, min_score: float = None):
+    """
+    Takes a text query, embeds it, and searches Pinecone for the most similar vectors.
+    """
+    with span("search_documents", top_k=top_k):
+        try:
+            # 1. Create an embedding for the user's query
+            with span("embed_queries"):
+                query_embedding = embed_queries([query])[0]
+
+            # 2. Query Pinecone for the top_k most similar vectors
+            with span("vector_query"):
+                return search_by_embedding(query_embedding, top_k, metadata_filter, min_score)
+
+        except Exception:
+            logger.exception("An error occurred during search")
+            return []
+
+
+async def search_documents_batch(queries, top_k: int = 3, metadata_filter: dict = None, min_score: float = None):
+    """
+    Searches for several queries at once: they are embedded in one model call and
+    the index is queried for all of them concurrently. Returns one result list per query.
+    """
+    with span("search_documents", queries=len(queries), top_k=top_k):
+        try:
+            with span("embed_queries"):
+                embeddings = await run_in_executor("embedding", embed_queries, list(queries))
+        except ExecutorOverloadedError:
+            # Callers turn this into a "try again later" response
+            raise
+        except Exception:
+            logger.exception("An error occurred while embedding queries")
+            return [[] for _ in queries]
+
+        async def run_query(embedding):
+            try:
+                with span("vector_query"):
+                    return await asyncio.to_thread(search_by_embedding, embedding, top_k, metadata_filter, min_score)
+            except Exception:
+                logger.exception("An error occurred during search")
+                return []
+
+        return await asyncio.gather(*(run_query(embedding) for embedding in embeddings))
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+# Any sentence-transformers model name or local path
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+# How the model runs:
+# - "torch": the published float32 weights on PyTorch (default)
+# - "torch-int8": PyTorch with the Linear layers dynamically quantized to int8
+# - "onnx": the model's ONNX export on ONNX Runtime
+# - "onnx-int8": a quantized ONNX export, picked by EMBEDDING_ONNX_FILE
+# The ONNX backends also need `pip install "sentence-transformers[onnx]"`
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+# Threads one encode call may use; 0 keeps the library default (one per core)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+# How stored embeddings (chunk cache, local index) are kept: float32, float16 or int8
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32").lower()
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+STORAGE_FORMATS = ("float32", "float16", "int8")
+
+
+def create_model(name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND, threads: int = EMBED_THREADS):
+    """Loads the embedding model for `backend`. Every backend has the SentenceTransformer encode API."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if backend.startswith("torch"):
+        import torch
+
+        if threads:
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(name, device="cpu")
+        if backend == "torch-int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if backend == "onnx-int8":
+        model_kwargs["file_name"] = EMBEDDING_ONNX_FILE
+    if threads:
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = options
+    return SentenceTransformer(name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+def check_storage(storage: str) -> str:
+    if storage not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown EMBEDDING_STORAGE '{storage}', expected one of {', '.join(STORAGE_FORMATS)}")
+    return storage
+
+
+def compress(vectors, storage: str = EMBEDDING_STORAGE):
+    """
+    Converts float vectors (one per row) to `storage`. Returns (values, scales):
+    int8 keeps one float32 scale per vector (its largest magnitude / 127), the
+    other formats have no scales.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if check_storage(storage) == "float32":
+        return vectors, None
+    if storage == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=-1) / 127
+    scales = np.where(scales == 0, 1, scales)
+    return np.round(vectors / scales[..., None]).astype(np.int8), scales.astype(np.float32)
+
+
+def decompress(values, scales=None) -> np.ndarray:
+    vectors = np.asarray(values, dtype=np.float32)
+    return vectors if scales is None else vectors * np.asarray(scales, dtype=np.float32)[..., None]
+
+
+def to_blob(vector, storage: str = EMBEDDING_STORAGE) -> bytes:
+    """One vector as bytes; int8 blobs start with the float32 scale."""
+    values, scales = compress(np.asarray(vector)[None], storage)
+    return values.tobytes() if scales is None else scales.tobytes() + values.tobytes()
+
+
+def from_blob(blob: bytes, storage: str) -> np.ndarray:
+    if storage == "int8":
+        scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale
+    return np.frombuffer(blob, dtype=np.dtype(storage)).astype(np.float32)
@@ -0,0 +1,221 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from .document_embedder import process_and_embed_document, iter_text
+
+# Only this many files are embedded at the same time, whatever the number of jobs,
+# so bulk ingestion leaves room for search and chat traffic
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+# Files waiting across all jobs; new jobs are rejected beyond this
+INGESTION_MAX_QUEUED_FILES = int(os.getenv("INGESTION_MAX_QUEUED_FILES", "1000"))
+# Finished jobs kept around for the status endpoint
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "100"))
+
+
+class IngestionQueueFullError(RuntimeError):
+    """Raised when a job would push the ingestion queue past its limit."""
+
+
+class FileTask:
+    """One document inside a job: either a plain file or a member of a zip archive."""
+
+    def __init__(self, name: str, path: Path, member: str = None):
+        self.name = name
+        self.path = path
+        self.member = member
+        self.status = "queued"
+        self.chunks = 0
+        self.upserted = 0
+        self.deleted = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def open(self):
+        if self.member is None:
+            return open(self.path, "rb")
+        archive = zipfile.ZipFile(self.path)
+        return _ZipMember(archive, archive.open(self.member))
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "chunks": self.chunks,
+            "upserted": self.upserted,
+            "deleted": self.deleted,
+            "error": self.error,
+            "seconds": _elapsed(self.started_at, self.finished_at),
+        }
+
+
+class _ZipMember:
+    """Closes the archive together with the member opened from it."""
+
+    def __init__(self, archive, member):
+        self.archive = archive
+        self.member = member
+
+    def read(self, size=-1):
+        return self.member.read(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.member.close()
+        self.archive.close()
+
+
+class IngestionJob:
+    def __init__(self, files, workdir: Path):
+        self.id = uuid.uuid4().hex
+        self.files = files
+        self.workdir = workdir
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.remaining = len(files)
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "failed" if all(f.status == "failed" for f in self.files) else "completed"
+        return "processing" if self.started_at is not None else "queued"
+
+    def to_dict(self) -> dict:
+        total_chunks = sum(f.chunks for f in self.files)
+        elapsed = _elapsed(self.started_at, self.finished_at)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "files_total": len(self.files),
+            "files_done": sum(f.status == "done" for f in self.files),
+            "files_failed": sum(f.status == "failed" for f in self.files),
+            "chunks": total_chunks,
+            "seconds": elapsed,
+            "chunks_per_second": round(total_chunks / elapsed, 1) if elapsed else None,
+            "files": [f.to_dict() for f in self.files],
+        }
+
+
+def _elapsed(started_at, finished_at):
+    if started_at is None:
+        return None
+    return round((finished_at or time.time()) - started_at, 2)
+
+
+class IngestionJobManager:
+    """
+    Runs ingestion jobs in the background on a fixed number of worker tasks.
+    Uploaded files are copied to a temporary directory, since the request
+    that brought them is long gone by the time a worker picks them up.
+    """
+
+    def __init__(self, workers: int = INGESTION_WORKERS, max_queued_files: int = INGESTION_MAX_QUEUED_FILES):
+        self.workers = workers
+        self.max_queued_files = max_queued_files
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def _ensure_workers(self):
+        # Workers are started from inside the event loop on first use
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, uploads) -> IngestionJob:
+        """
+        Creates a job from (filename, binary file) pairs. Zip archives are
+        expanded into one task per .txt member. Returns the queued job.
+        """
+        self._ensure_workers()
+        workdir, files = await asyncio.to_thread(self._stage, uploads)
+        if self._queue.qsize() + len(files) > self.max_queued_files:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise IngestionQueueFullError("The ingestion queue is full, please try again later.")
+
+        job = IngestionJob(files, workdir)
+        self.jobs[job.id] = job
+        for task in files:
+            self._queue.put_nowait((job, task))
+        self._prune()
+        return job
+
+    def _stage(self, uploads):
+        """Copies the uploads to a temporary directory and lists the documents in them."""
+        workdir = Path(tempfile.mkdtemp(prefix="ingest-"))
+        files = []
+        try:
+            for i, (filename, fileobj) in enumerate(uploads):
+                path = workdir / f"{i}-{Path(filename).name}"
+                with open(path, "wb") as out:
+                    shutil.copyfileobj(fileobj, out)
+                if filename.lower().endswith(".zip"):
+                    with zipfile.ZipFile(path) as archive:
+                        members = [m for m in archive.namelist() if m.lower().endswith(".txt")]
+                    files.extend(FileTask(f"{filename}/{m}", path, m) for m in members)
+                elif filename.lower().endswith(".txt"):
+                    files.append(FileTask(filename, path))
+                else:
+                    raise ValueError(f"Unsupported file '{filename}', only .txt and .zip files are allowed.")
+            if not files:
+                raise ValueError("No .txt documents were found in the upload.")
+        except BaseException:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        return workdir, files
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job, task = await self._queue.get()
+            try:
+                await self._process(job, task)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: IngestionJob, task: FileTask):
+        if job.started_at is None:
+            job.started_at = time.time()
+        task.status = "processing"
+        task.started_at = time.time()
+
+        def on_progress(chunks):
+            task.chunks = chunks
+
+        try:
+            with task.open() as f:
+                stats = await process_and_embed_document(iter_text(f), task.name, on_progress)
+            task.chunks = stats["chunks"]
+            task.upserted = stats["upserted"]
+            task.deleted = stats["deleted"]
+            task.status = "done"
+        except Exception as e:
+            task.status = "failed"
+            task.error = str(e)
+        task.finished_at = time.time()
+
+        job.remaining -= 1
+        if job.remaining == 0:
+            self._finish(job)
+
+    def _finish(self, job: IngestionJob):
+        job.finished_at = time.time()
+        shutil.rmtree(job.workdir, ignore_errors=True)
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        for job in finished[:max(len(finished) - INGESTION_JOB_HISTORY, 0)]:
+            del self.jobs[job.id]
+
+
+job_manager = IngestionJobManager()
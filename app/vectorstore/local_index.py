@@ -0,0 +1,272 @@
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+from .embedding_backend import check_storage, compress
+
+INITIAL_CAPACITY = 1024
+# Rows scored per block when vectors are stored compressed and have to be widened first
+SCORE_BLOCK_ROWS = 16384
+
+
+class LocalVectorIndex:
+    """
+    An in-process vector index that answers the same upsert/query/delete calls
+    as a Pinecone index, so the embedder and retriever work with either.
+
+    Vectors are normalized and kept in a memory-mapped file, and a query is an
+    exact (brute-force) cosine similarity scan over them. `storage` float16 or
+    int8 (with a float32 scale per vector) halves or quarters the file at a
+    small cost in score precision. Ids and metadata
+    live in a SQLite table next to it. Metadata fields other than the chunk text
+    are also indexed in memory so queries can be filtered on them.
+    """
+
+    def __init__(self, path: Path, dimension: int, storage: str = "float32"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self.storage = check_storage(storage)
+        self._lock = threading.RLock()
+
+        self._db = sqlite3.connect(self.path / "metadata.db", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (slot INTEGER PRIMARY KEY, vector_id TEXT UNIQUE NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._check_settings()
+
+        self._ids = []
+        self._slot_of = {}
+        self._free = []
+        self._fields = defaultdict(lambda: defaultdict(set))
+        self._slot_fields = {}
+        self._vectors = None
+        self._scales = None
+        self._valid = np.zeros(0, dtype=bool)
+        self._load()
+
+    # --- Pinecone-compatible API ---
+
+    def upsert(self, vectors):
+        if not vectors:
+            return {"upserted_count": 0}
+        with self._lock:
+            rows = []
+            for vector in vectors:
+                slot = self._slot_of.get(vector["id"])
+                if slot is None:
+                    slot = self._allocate_slot()
+                    self._ids[slot] = vector["id"]
+                    self._slot_of[vector["id"]] = slot
+                else:
+                    self._unindex_fields(slot)
+                values = np.asarray(vector["values"], dtype=np.float32)
+                norm = np.linalg.norm(values)
+                values, scales = compress(values / norm if norm else values, self.storage)
+                self._vectors[slot] = values
+                if scales is not None:
+                    self._scales[slot] = scales
+                self._valid[slot] = True
+                metadata = vector.get("metadata") or {}
+                self._index_fields(slot, metadata)
+                rows.append((slot, vector["id"], json.dumps(metadata)))
+
+            self._flush()
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vectors (slot, vector_id, metadata) VALUES (?, ?, ?)", rows
+                )
+        return {"upserted_count": len(rows)}
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False, filter: dict = None, **kwargs):
+        matches = self.query_many([vector], top_k=top_k, include_metadata=include_metadata, filter=filter)
+        return {"matches": matches[0]}
+
+    def query_many(self, vectors, top_k: int = 10, include_metadata: bool = False, filter: dict = None):
+        """Scores several query vectors in one matrix product. Returns a list of match lists."""
+        queries = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            count = len(self._ids)
+            mask = self._valid[:count] & self._filter_mask(filter, count)
+            candidates = np.flatnonzero(mask)
+            if len(candidates) == 0 or top_k <= 0:
+                return [[] for _ in queries]
+            scores = self._scores(queries, None if len(candidates) == count else candidates, count)
+
+            k = min(top_k, scores.shape[1])
+            results = []
+            for row in scores:
+                best = np.argpartition(-row, k - 1)[:k]
+                best = best[np.argsort(-row[best])]
+                slots = best if len(candidates) == count else candidates[best]
+                results.append([
+                    {"id": self._ids[slot], "score": float(row[i]), "slot": int(slot)}
+                    for i, slot in zip(best, slots)
+                ])
+
+            if include_metadata:
+                wanted = {match["slot"] for matches in results for match in matches}
+                metadata = self._fetch_metadata(wanted)
+                for matches in results:
+                    for match in matches:
+                        match["metadata"] = metadata.get(match["slot"], {})
+            for matches in results:
+                for match in matches:
+                    del match["slot"]
+        return results
+
+    def delete(self, ids=None, **kwargs):
+        with self._lock:
+            slots = [self._slot_of.pop(vector_id) for vector_id in ids or [] if vector_id in self._slot_of]
+            for slot in slots:
+                self._unindex_fields(slot)
+                self._ids[slot] = None
+                self._valid[slot] = False
+                self._free.append(slot)
+            with self._db:
+                self._db.executemany("DELETE FROM vectors WHERE slot = ?", [(slot,) for slot in slots])
+        return {}
+
+    def list(self, prefix: str = "", limit: int = 100):
+        """Yields pages of up to `limit` vector IDs starting with `prefix`, like Pinecone's list."""
+        with self._lock:
+            ids = sorted(vector_id for vector_id in self._slot_of if vector_id.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self, **kwargs):
+        return {"dimension": self.dimension, "total_vector_count": len(self._slot_of)}
+
+    # --- Internals ---
+
+    def _check_settings(self):
+        # The vector file layout depends on both, so an index can't be reopened with others
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)",
+                # Indexes created before these were recorded hold float32 vectors
+                [("dimension", str(self.dimension)), ("storage", "float32" if self._has_rows() else self.storage)],
+            )
+        stored = dict(self._db.execute("SELECT name, value FROM settings").fetchall())
+        if stored["dimension"] != str(self.dimension) or stored["storage"] != self.storage:
+            raise ValueError(
+                f"Local index at {self.path} holds {stored['dimension']}-dimensional {stored['storage']} vectors, "
+                f"not {self.dimension}-dimensional {self.storage}; rebuild it or use another LOCAL_INDEX_PATH"
+            )
+
+    def _has_rows(self) -> bool:
+        return self._db.execute("SELECT 1 FROM vectors LIMIT 1").fetchone() is not None
+
+    def _scores(self, queries, candidates, count):
+        """Cosine scores of the queries against all `count` rows, or only the `candidates` rows."""
+        if self.storage == "float32":
+            rows = self._vectors[:count] if candidates is None else self._vectors[candidates]
+            return queries @ rows.T
+
+        rows = np.arange(count) if candidates is None else candidates
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            block = rows[start:start + SCORE_BLOCK_ROWS]
+            part = queries @ self._vectors[block].astype(np.float32).T
+            if self._scales is not None:
+                part *= self._scales[block]
+            scores[:, start:start + len(block)] = part
+        return scores
+
+    def _load(self):
+        rows = self._db.execute("SELECT slot, vector_id, metadata FROM vectors").fetchall()
+        count = max((slot for slot, _, _ in rows), default=-1) + 1
+        self._open_vectors(max(INITIAL_CAPACITY, count))
+        self._ids = [None] * count
+        self._valid = np.zeros(len(self._vectors), dtype=bool)
+        for slot, vector_id, metadata in rows:
+            self._ids[slot] = vector_id
+            self._slot_of[vector_id] = slot
+            self._valid[slot] = True
+            self._index_fields(slot, json.loads(metadata))
+        self._free = [slot for slot, vector_id in enumerate(self._ids) if vector_id is None]
+
+    def _open_vectors(self, capacity: int):
+        suffix = {"float32": "f32", "float16": "f16", "int8": "i8"}[self.storage]
+        self._vectors = self._open_file(f"vectors.{suffix}", np.dtype(self.storage), (capacity, self.dimension))
+        if self.storage == "int8":
+            self._scales = self._open_file("scales.f32", np.dtype(np.float32), (capacity,))
+
+    def _open_file(self, name: str, dtype, shape):
+        file = self.path / name
+        needed = int(np.prod(shape)) * dtype.itemsize
+        if not file.exists() or file.stat().st_size < needed:
+            with open(file, "ab") as f:
+                f.truncate(needed)
+        return np.memmap(file, dtype=dtype, mode="r+", shape=shape)
+
+    def _flush(self):
+        self._vectors.flush()
+        if self._scales is not None:
+            self._scales.flush()
+
+    def _allocate_slot(self) -> int:
+        if self._free:
+            return self._free.pop()
+        slot = len(self._ids)
+        if slot >= len(self._vectors):
+            # Double the file and remap it
+            capacity = len(self._vectors) * 2
+            self._flush()
+            self._vectors = self._scales = None
+            self._open_vectors(capacity)
+            self._valid = np.concatenate([self._valid, np.zeros(capacity - len(self._valid), dtype=bool)])
+        self._ids.append(None)
+        return slot
+
+    def _index_fields(self, slot: int, metadata: dict):
+        indexed = [
+            (field, value) for field, value in metadata.items()
+            if field != "text" and isinstance(value, (str, int, float, bool))
+        ]
+        for field, value in indexed:
+            self._fields[field][value].add(slot)
+        self._slot_fields[slot] = indexed
+
+    def _unindex_fields(self, slot: int):
+        for field, value in self._slot_fields.pop(slot, []):
+            slots = self._fields[field][value]
+            slots.discard(slot)
+            if not slots:
+                del self._fields[field][value]
+
+    def _filter_mask(self, filter: dict, count: int):
+        """Supports {"field": value}, {"field": {"$eq": value}} and {"field": {"$in": [...]}}."""
+        mask = np.ones(count, dtype=bool)
+        for field, condition in (filter or {}).items():
+            if isinstance(condition, dict):
+                if "$eq" in condition:
+                    values = [condition["$eq"]]
+                elif "$in" in condition:
+                    values = condition["$in"]
+                else:
+                    raise ValueError(f"Unsupported filter operator in {condition}")
+            else:
+                values = [condition]
+            allowed = np.zeros(count, dtype=bool)
+            for value in values:
+                slots = self._fields.get(field, {}).get(value)
+                if slots:
+                    allowed[list(slots)] = True
+            mask &= allowed
+        return mask
+
+    def _fetch_metadata(self, slots) -> dict:
+        if not slots:
+            return {}
+        slots = list(slots)
+        placeholders = ",".join("?" * len(slots))
+        rows = self._db.execute(f"SELECT slot, metadata FROM vectors WHERE slot IN ({placeholders})", slots).fetchall()
+        return {slot: json.loads(metadata) for slot, metadata in rows}
@@ -1,27 +1,52 @@
 import os
-from pinecone import Pinecone, ServerlessSpec
+from pathlib import Path
 from dotenv import load_dotenv
+from ..services.components import register_component
+from .embedding_backend import EMBEDDING_STORAGE
 
 # Load environment variables
 load_dotenv()
 
+# "pinecone" (default) or "local" for the in-process index in local_index.py
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_INDEX_PATH = Path(os.getenv("LOCAL_INDEX_PATH", "app/data/local_index"))
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "smart-city-assistant")
 
-if not PINECONE_API_KEY:
-    raise ValueError("PINECONE_API_KEY is not set in the .env file")
+# Normally taken from the embedding model; set it to skip loading the model just for this
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "0"))
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=PINECONE_API_KEY)
+def embedding_dimension() -> int:
+    """The vector size of the configured embedding model (384 for all-MiniLM-L6-v2)."""
+    if EMBEDDING_DIMENSION:
+        return EMBEDDING_DIMENSION
+    from .document_embedder import get_model
+    return get_model().get_sentence_embedding_dimension()
 
 def get_pinecone_index():
     """Initializes and returns the Pinecone index."""
-    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
+    from pinecone import Pinecone, ServerlessSpec
+
+    if not PINECONE_API_KEY:
+        raise ValueError("PINECONE_API_KEY is not set in the .env file")
+
+    # Initialize Pinecone client
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    dimension = embedding_dimension()
+
+    if PINECONE_INDEX_NAME in pc.list_indexes().names():
+        existing = pc.describe_index(PINECONE_INDEX_NAME).dimension
+        if existing != dimension:
+            raise ValueError(
+                f"Pinecone index '{PINECONE_INDEX_NAME}' has dimension {existing} but the embedding model "
+                f"produces {dimension}; use another PINECONE_INDEX_NAME for this model"
+            )
+    else:
         # Create the index if it doesn't exist.
-        # Dimension 384 is for the 'all-MiniLM-L6-v2' sentence transformer.
         pc.create_index(
             name=PINECONE_INDEX_NAME,
-            dimension=384, 
+            dimension=dimension,
             metric='cosine',
             spec=ServerlessSpec(
                 cloud='aws',
@@ -30,5 +55,34 @@ def get_pinecone_index():
         )
     return pc.Index(PINECONE_INDEX_NAME)
 
-# Get the index instance to be used by other modules
-index = get_pinecone_index()
+def get_local_index():
+    """Opens (or creates) the local on-disk index."""
+    from .local_index import LocalVectorIndex
+    return LocalVectorIndex(LOCAL_INDEX_PATH, dimension=embedding_dimension(), storage=EMBEDDING_STORAGE)
+
+def index_location() -> str:
+    """Names the index the configured VECTOR_BACKEND points at."""
+    if VECTOR_BACKEND == "local":
+        return f"local:{LOCAL_INDEX_PATH.resolve()}"
+    return f"{VECTOR_BACKEND}:{PINECONE_INDEX_NAME}"
+
+def create_index():
+    """Connects to the index for the configured VECTOR_BACKEND."""
+    if VECTOR_BACKEND == "local":
+        return get_local_index()
+    if VECTOR_BACKEND == "pinecone":
+        return get_pinecone_index()
+    raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}', expected 'pinecone' or 'local'")
+
+# The index is only connected to on first use (or on warm-up)
+index_component = register_component("vector_index", create_index)
+
+def get_index():
+    """Returns the index instance to be used by other modules."""
+    return index_component.get()
+
+def __getattr__(name):
+    # Keeps `pinecone_client.index` working without connecting at import time
+    if name == "index":
+        return get_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,116 @@
+"""
+Tail latency of /chat/ask while CSV analysis jobs run.
+
+Drives the FastAPI app in-process with a stub chat model (fixed latency) and
+measures /chat/ask latency on its own, then with a steady stream of
+/analysis/forecast uploads running alongside. The analysis work is run three
+ways: on the event loop, on a thread (the previous behaviour) and on the
+analysis process pool. Run from the project root:
+
+    python -m benchmarks.analysis_contention [--csv-mb 30] [--chat-requests 300]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from app.api import data_analysis_router
+from app.main import app
+from app.services import executors, llm_service
+from benchmarks.csv_stream import write_csv
+from benchmarks.llm_load import StubModel
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) * 1000 if values else float("nan")
+
+
+async def run_inline(workload, fn, *args, bounded=True):
+    # Worst case: the parse blocks the event loop
+    return fn(*args)
+
+
+async def run_in_thread(workload, fn, *args, bounded=True):
+    # The previous behaviour: a thread in this process, sharing the GIL
+    return await asyncio.to_thread(fn, *args)
+
+
+async def run_scenario(client, csv_bytes: bytes, chat_requests: int, analysis_jobs: int, chat_concurrency: int):
+    stop = asyncio.Event()
+    analysis_done = 0
+
+    async def analysis_worker():
+        nonlocal analysis_done
+        while not stop.is_set():
+            response = await client.post(
+                "/analysis/forecast",
+                params={"kpi_column": "energy"},
+                files={"file": ("data.csv", csv_bytes, "text/csv")},
+            )
+            response.raise_for_status()
+            analysis_done += 1
+
+    latencies = []
+    remaining = iter(range(chat_requests))
+
+    async def chat_worker():
+        for i in remaining:
+            start = time.perf_counter()
+            response = await client.post("/chat/ask", json={"prompt": f"question {i}", "use_cache": False})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    background = [asyncio.create_task(analysis_worker()) for _ in range(analysis_jobs)]
+    # Let the analysis jobs get going before measuring
+    if background:
+        await asyncio.sleep(0.5)
+    await asyncio.gather(*(chat_worker() for _ in range(chat_concurrency)))
+    stop.set()
+    await asyncio.gather(*background)
+    return latencies, analysis_done
+
+
+async def main(csv_mb: int, chat_requests: int, analysis_jobs: int, chat_concurrency: int, latency: float):
+    llm_service.llm_component.set(StubModel(latency))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "data.csv"
+        write_csv(path, csv_mb)
+        csv_bytes = path.read_bytes()
+
+    print(f"stub latency={latency * 1000:.0f}ms, csv={csv_mb}MB, analysis jobs={analysis_jobs}, "
+          f"ANALYSIS_WORKERS={executors.executors['analysis'].workers}")
+    print(f"{'scenario':>16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'forecasts':>10}")
+
+    original = data_analysis_router.run_in_executor
+    scenarios = [
+        ("chat only", None, 0),
+        ("event loop", run_inline, analysis_jobs),
+        ("thread", run_in_thread, analysis_jobs),
+        ("process pool", original, analysis_jobs),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Spawn the worker processes up front so start-up isn't counted
+        await executors.run_in_executor("analysis", sum, [])
+        for name, runner, jobs in scenarios:
+            data_analysis_router.run_in_executor = runner or original
+            latencies, forecasts = await run_scenario(client, csv_bytes, chat_requests, jobs, chat_concurrency)
+            print(f"{name:>16} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {max(latencies) * 1000:>8.1f} {forecasts:>10}")
+    data_analysis_router.run_in_executor = original
+    executors.shutdown_executors()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv-mb", type=int, default=30)
+    parser.add_argument("--chat-requests", type=int, default=300)
+    parser.add_argument("--analysis-jobs", type=int, default=2)
+    parser.add_argument("--chat-concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.csv_mb, args.chat_requests, args.analysis_jobs, args.chat_concurrency, args.latency))
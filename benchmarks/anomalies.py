@@ -0,0 +1,64 @@
+"""
+Benchmark for the anomaly detectors.
+
+Generates `rows` sensor readings spread over `groups` districts and times
+each detector on the whole CSV, then times incremental mode: scoring a small
+appended batch with the saved detector state, against re-scoring the whole
+history with the batch appended. Run from the project root:
+
+    python -m benchmarks.anomalies [--rows 1000000] [--groups 2000] [--window 30]
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.analysis.anomalies import detect_anomalies
+
+
+def make_csv(rows: int, groups: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "district": np.tile([f"district-{g}" for g in range(groups)], rows // groups),
+        "energy": rng.normal(1000, 50, rows // groups * groups),
+    })
+    return frame.to_csv(index=False).encode()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(rows: int, groups: int, window: int, append: int):
+    history = make_csv(rows, groups)
+    appended = make_csv(append, groups, seed=1)
+    print(f"{rows:,} rows, {groups} groups, window={window}, {len(history) / 1e6:.0f} MB")
+
+    _, parse = timed(pd.read_csv, io.BytesIO(history))
+    print(f"{'read_csv only':>16}: {parse * 1000:8.0f} ms")
+    print(f"{'method':>16}  {'full':>8}  {'append':>8}  {'re-run':>8}  anomalies")
+    for method in ("threshold", "zscore", "iqr", "ewma"):
+        options = dict(method=method, group_by="district", window=window, threshold=1150, limit=100)
+        result, full = timed(detect_anomalies, io.BytesIO(history), "energy", **options)
+
+        # Incremental: only the new rows, continuing from the saved state
+        _, incremental = timed(detect_anomalies, io.BytesIO(appended), "energy", state=result["state"], **options)
+        # Without state, the whole history has to be scored again
+        combined = history + appended.split(b"\n", 1)[1]
+        _, rerun = timed(detect_anomalies, io.BytesIO(combined), "energy", **options)
+
+        print(f"{method:>16}  {full * 1000:6.0f}ms  {incremental * 1000:6.0f}ms  {rerun * 1000:6.0f}ms  {result['count']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=30)
+    parser.add_argument("--append", type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.rows, args.groups, args.window, args.append)
@@ -0,0 +1,97 @@
+"""
+Memory and throughput benchmark for CSV analysis.
+
+Generates sensor exports of 10MB, 100MB and 1GB and runs the forecast and
+anomaly computations on each, every run in a fresh subprocess so its peak
+RSS can be measured. The old approach (read, decode, StringIO, read_csv) is
+included for the smaller files as a baseline. Run from the project root:
+
+    python -m benchmarks.csv_stream [--sizes 10 100 1000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+
+ROWS_PER_BLOCK = 100_000
+
+
+def write_csv(path: Path, megabytes: int):
+    rng = np.random.default_rng(0)
+    target = megabytes * 1024 * 1024
+    with open(path, "w") as f:
+        f.write("year,district,sensor_id,energy,water\n")
+        while f.tell() < target:
+            years = rng.integers(1990, 2025, ROWS_PER_BLOCK)
+            energy = rng.normal(1000, 100, ROWS_PER_BLOCK)
+            water = rng.normal(500, 50, ROWS_PER_BLOCK)
+            sensors = rng.integers(0, 5000, ROWS_PER_BLOCK)
+            f.write("".join(
+                f"{y},district-{s % 20},{s},{e:.3f},{w:.3f}\n"
+                for y, s, e, w in zip(years, sensors, energy, water)
+            ))
+
+
+def run_once(mode: str, path: str):
+    """Runs one analysis in this process and prints seconds and peak RSS in MB."""
+    start = time.perf_counter()
+    if mode == "stream":
+        from app.analysis.anomalies import detect_anomalies
+        from app.analysis.csv_stream import linear_trend
+        with open(path, "rb") as f:
+            linear_trend(f, "energy")
+        with open(path, "rb") as f:
+            detect_anomalies(f, "energy", method="threshold", threshold=1300.0, limit=1000)
+    else:
+        import pandas as pd
+        from sklearn.linear_model import LinearRegression
+        with open(path, "rb") as f:
+            contents = f.read()
+        df = pd.read_csv(StringIO(contents.decode("utf-8")))
+        LinearRegression().fit(df[["year"]], df[["energy"]])
+        df[df["energy"] > 1300.0].to_dict(orient="records")
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed} {peak_mb}")
+
+
+def measure(mode: str, path: Path):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.csv_stream", "--run", mode, str(path)],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="file sizes in MB")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_once(*args.run)
+        return
+
+    print(f"{'file':>8} {'mode':>9} {'seconds':>8} {'MB/s':>8} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for megabytes in args.sizes:
+            path = Path(tmp) / f"sensors-{megabytes}mb.csv"
+            write_csv(path, megabytes)
+            actual_mb = os.path.getsize(path) / 1024 / 1024
+            # Reading a 1GB file whole needs several GB, so the baseline stops at 100MB
+            modes = ["stream", "in-memory"] if megabytes <= 100 else ["stream"]
+            for mode in modes:
+                seconds, peak = measure(mode, path)
+                print(f"{megabytes:>6}MB {mode:>9} {seconds:>8.2f} {actual_mb / seconds:>8.1f} {peak:>12.0f}")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark for analyses on stored datasets.
+
+Writes a sensor export of `--mb` megabytes, stores it as a dataset, then runs
+the same analyses three ways: from the CSV (parsed every time), from the
+dataset with an empty frame cache (Parquet read), and from the dataset with
+the frame already in memory. Run from the project root:
+
+    python -m benchmarks.datasets [--mb 100]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.analysis.anomalies import detect_anomalies
+from app.analysis.csv_stream import linear_trend
+from app.analysis.datasets import DatasetRegistry
+from app.analysis.forecasting import forecast_report
+from benchmarks.csv_stream import write_csv
+
+ANALYSES = {
+    "forecast": (linear_trend, ("energy",)),
+    "forecast-kpis": (forecast_report, (None, "district", 3)),
+    "anomalies": (detect_anomalies, ("energy", "threshold", None, 30, None, 1300)),
+    "anomalies-zscore": (detect_anomalies, ("energy", "zscore", "district")),
+}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(megabytes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "data.csv"
+        write_csv(csv_path, megabytes)
+        registry = DatasetRegistry(Path(tmp) / "datasets")
+
+        start = time.perf_counter()
+        info = registry.store(str(csv_path))
+        print(f"{megabytes}MB CSV, {info['rows']:,} rows -> {info['bytes'] / 1e6:.0f}MB Parquet "
+              f"in {time.perf_counter() - start:.1f}s")
+        print(f"{'analysis':>18} {'csv':>8} {'cold':>8} {'warm':>8}")
+
+        for name, (fn, args) in ANALYSES.items():
+            from_csv = timed(fn, str(csv_path), *args)
+            registry.frames.discard(info["dataset_id"])
+            cold = timed(lambda: fn(registry.load(info["dataset_id"]), *args))
+            warm = timed(lambda: fn(registry.load(info["dataset_id"]), *args))
+            print(f"{name:>18} {from_csv:>7.2f}s {cold:>7.2f}s {warm:>7.2f}s")
+        print(f"frame cache: {registry.frames.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=100)
+    args = parser.parse_args()
+    main(args.mb)
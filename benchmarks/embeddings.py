@@ -0,0 +1,130 @@
+"""
+Throughput and retrieval-quality benchmark for the embedding backends.
+
+Embeds the same corpus with every EMBEDDING_BACKEND (torch, torch-int8, onnx,
+onnx-int8) and reports texts/second, how close each backend's vectors are to
+the float32 torch ones, and the recall@10 of searches over each backend's
+vectors (stored in every EMBEDDING_STORAGE format) against the float32 torch
+results. Backends whose dependencies aren't installed are skipped. Run from
+the project root:
+
+    python -m benchmarks.embeddings
+    python -m benchmarks.embeddings --model all-MiniLM-L6-v2 --threads 4 --batch-size 64
+    python -m benchmarks.embeddings --corpus passages.txt    # one passage per line
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+
+import numpy as np
+
+from app.vectorstore.embedding_backend import BACKENDS, EMBEDDING_MODEL, STORAGE_FORMATS, compress, create_model, decompress
+
+TOP_K = 10
+SUBJECTS = (
+    "The city council", "Residents of the north district", "The transport department", "The water utility",
+    "Local businesses", "The energy office", "Waste collection crews", "The parks department",
+)
+ACTIONS = (
+    "approved a new budget for", "reported delays in", "asked for more information about", "published a report on",
+    "started a pilot program for", "raised concerns about", "extended the schedule of", "installed sensors to monitor",
+)
+TOPICS = (
+    "bus routes", "street lighting", "recycling", "solar panels on public buildings", "air quality", "noise levels",
+    "water leaks", "bike lanes", "parking permits", "flood defenses", "electric vehicle chargers", "housing permits",
+)
+DETAILS = (
+    "after complaints from residents.", "ahead of the winter season.", "to cut emissions by 2030.",
+    "following last month's storm.", "in the downtown area.", "with funding from the regional government.",
+)
+
+
+def make_corpus(rng: random.Random, count: int) -> list:
+    """Distinct sentences only: duplicates would tie in the rankings and make recall noisy."""
+    combinations = list(itertools.product(SUBJECTS, ACTIONS, TOPICS, DETAILS))
+    if count > len(combinations):
+        sys.exit(f"Only {len(combinations)} distinct sentences can be generated; pass --corpus for more documents")
+    return [" ".join(parts) for parts in rng.sample(combinations, count)]
+
+
+def load_corpus(args) -> tuple:
+    rng = random.Random(args.seed)
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            passages = [line.strip() for line in f if line.strip()][:args.documents]
+    else:
+        passages = make_corpus(rng, args.documents)
+    queries = [f"What is happening with {rng.choice(TOPICS)}?" for _ in range(args.queries // 2)]
+    queries += rng.sample(passages, min(len(passages), args.queries - len(queries)))
+    return passages, queries
+
+
+def embed(model, texts, batch_size: int) -> tuple:
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+
+def top_k(queries, passages) -> np.ndarray:
+    scores = queries @ passages.T
+    return np.argsort(-scores, axis=1)[:, :TOP_K]
+
+
+def recall(found, expected) -> float:
+    return float(np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(found, expected)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated EMBEDDING_BACKEND values")
+    parser.add_argument("--threads", type=int, default=0, help="EMBED_THREADS; 0 for the library default")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--documents", type=int, default=4000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--corpus", help="text file with one passage per line, instead of generated sentences")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    passages, queries = load_corpus(args)
+    print(f"model {args.model}, {len(passages)} passages, {len(queries)} queries, batch size {args.batch_size}")
+
+    reference = None
+    print(f"{'backend':>12} {'load s':>8} {'texts/s':>9} {'cosine':>8} " + " ".join(
+        f"{f'r@{TOP_K} {storage}':>12}" for storage in STORAGE_FORMATS
+    ))
+    for backend in ["torch"] + [b for b in args.backends.split(",") if b != "torch"]:
+        start = time.perf_counter()
+        try:
+            model = create_model(args.model, backend, args.threads)
+        except Exception as e:
+            if backend == "torch":
+                # Every other column is relative to float32 torch, so there is nothing to compare without it
+                sys.exit(f"The float32 torch reference could not be loaded: {e}")
+            print(f"{backend:>12} skipped: {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        passage_vectors, seconds = embed(model, passages, args.batch_size)
+        query_vectors, _ = embed(model, queries, args.batch_size)
+        if reference is None:
+            # float32 torch (always loaded first) is what every other backend and storage format is compared with
+            reference = passage_vectors, top_k(query_vectors, passage_vectors)
+        cosine = float(np.mean(np.sum(passage_vectors * reference[0], axis=1)))
+
+        recalls = []
+        for storage in STORAGE_FORMATS:
+            stored = decompress(*compress(passage_vectors, storage))
+            recalls.append(recall(top_k(query_vectors, stored), reference[1]))
+        print(
+            f"{backend:>12} {load_seconds:>8.1f} {len(passages) / seconds:>9.0f} {cosine:>8.4f} "
+            + " ".join(f"{r:>12.3f}" for r in recalls)
+        )
+        del model
+
+
+if __name__ == "__main__":
+    main()
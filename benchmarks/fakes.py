@@ -0,0 +1,132 @@
+"""
+Deterministic local stand-ins for the external services, for benchmarks that
+drive the whole app: a chat model with a configurable latency, a hashing
+embedding model and a vector index that simulates network latency. Answers and vectors depend only on their input, so two runs
+with the same settings send the app exactly the same work.
+"""
+import asyncio
+import hashlib
+import re
+import time
+import zlib
+
+import numpy as np
+
+VOCABULARY = (
+    "the city council residents waste recycling energy water transport bus route "
+    "permit district policy budget solar grid emissions park street lighting noise "
+    "housing zoning inspection collection schedule tariff subsidy sensor traffic"
+).split()
+
+
+class FakeMessage:
+    def __init__(self, content: str, usage_metadata: dict = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+class FakeChatModel:
+    """
+    Answers with `words` words picked from a hash of the prompt, after
+    `latency` seconds plus `seconds_per_prompt` for each prompt in the call.
+    Streams spread the same latency over the words. Usage metadata is
+    attached like the real model does, so token metrics work.
+    """
+
+    def __init__(self, latency: float = 0.1, words: int = 60, seconds_per_prompt: float = 0.0):
+        self.latency = latency
+        self.words = words
+        self.seconds_per_prompt = seconds_per_prompt
+
+    def _delay(self, prompts: int = 1) -> float:
+        return self.latency + self.seconds_per_prompt * prompts
+
+    def _answer(self, prompt: str) -> list:
+        digest = hashlib.sha256(str(prompt).encode("utf-8")).digest()
+        return [VOCABULARY[digest[i % len(digest)] % len(VOCABULARY)] for i in range(self.words)]
+
+    def _usage(self, prompt: str, output_tokens: int) -> dict:
+        input_tokens = len(str(prompt)) // 4 + 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def invoke(self, prompt):
+        time.sleep(self._delay())
+        words = self._answer(prompt)
+        return FakeMessage(" ".join(words), self._usage(prompt, len(words)))
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self._delay())
+        words = self._answer(prompt)
+        return FakeMessage(" ".join(words), self._usage(prompt, len(words)))
+
+    async def abatch(self, prompts, config: dict = None, return_exceptions: bool = False):
+        # One round trip for the whole batch, like a batch API (so max_concurrency doesn't apply)
+        await asyncio.sleep(self._delay(len(prompts)))
+        return [FakeMessage(" ".join(words), self._usage(p, len(words))) for p, words in ((p, self._answer(p)) for p in prompts)]
+
+    async def astream(self, prompt):
+        words = self._answer(prompt)
+        for i, word in enumerate(words):
+            await asyncio.sleep(self._delay() / len(words))
+            last = i == len(words) - 1
+            yield FakeMessage(word + ("" if last else " "), self._usage(prompt, len(words)) if last else None)
+
+
+class FakeEmbeddingModel:
+    """
+    Hashes each word of a text into one of `dimension` signed buckets and
+    normalizes the result, so texts that share words get similar vectors and
+    searches return sensible matches. `seconds_per_text` simulates the cost
+    of the real model (sleeping releases the GIL, as encode does).
+    """
+
+    def __init__(self, dimension: int = 384, seconds_per_text: float = 0.0):
+        self.dimension = dimension
+        self.seconds_per_text = seconds_per_text
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if self.seconds_per_text:
+            time.sleep(self.seconds_per_text * len(texts))
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                h = zlib.crc32(word.encode("utf-8"))
+                vectors[row, h % self.dimension] += 1.0 if h & 0x10000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+        return vectors[0] if single else vectors
+
+
+class FakeIndex:
+    """
+    Stands in for the Pinecone index, sleeping `latency` seconds for each
+    write request. Only vector IDs are kept, enough for upserts, deletes and
+    listing by prefix.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.ids = set()
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(self.latency)
+        self.ids.update(v["id"] if isinstance(v, dict) else v[0] for v in vectors)
+
+    def delete(self, ids, **kwargs):
+        time.sleep(self.latency)
+        self.ids.difference_update(ids)
+
+    def list(self, prefix: str = "", limit: int = 100):
+        ids = sorted(vector_id for vector_id in self.ids if vector_id.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
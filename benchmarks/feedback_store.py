@@ -0,0 +1,64 @@
+"""
+Benchmark for the feedback store.
+
+Pre-fills a temporary database with 10k, 100k and 1M records and then measures
+how many submissions per second the group-commit writer sustains with many
+concurrent submitters. Run from the project root:
+
+    python -m benchmarks.feedback_store
+"""
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.feedback_store import FeedbackStore
+
+SIZES = (10_000, 100_000, 1_000_000)
+SUBMISSIONS = 5_000
+CONCURRENCY = 200
+
+
+def make_record(i: int) -> dict:
+    return {
+        "timestamp": f"2024-01-01T00:00:{i % 60:02d}",
+        "user": f"user{i % 500}",
+        "category": ("Garbage", "Water", "Lights", "Other")[i % 4],
+        "message": f"Issue number {i}",
+    }
+
+
+def prefill(store: FeedbackStore, count: int):
+    batch = 50_000
+    for start in range(0, count, batch):
+        records = [make_record(i) for i in range(start, min(start + batch, count))]
+        with store._conn:
+            store._insert(records)
+
+
+async def submit_all(store: FeedbackStore) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def submit(i):
+        async with semaphore:
+            await store.add(make_record(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(submit(i) for i in range(SUBMISSIONS)))
+    return SUBMISSIONS / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{SUBMISSIONS} submissions, {CONCURRENCY} concurrent submitters")
+    print(f"{'existing records':>16} {'submissions/s':>14}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FeedbackStore(Path(tmp) / "feedback.db")
+            prefill(store, size)
+            throughput = asyncio.run(submit_all(store))
+            store.close()
+        print(f"{size:>16} {throughput:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark for the grouped multi-KPI forecasting engine.
+
+Builds a frame of `groups` districts x `years` years x `kpis` KPI columns and
+times the vectorized fit (all trends at once, with prediction intervals),
+the full forecast from a CSV file object (checked against the same forecast
+from the DataFrame), and, as a baseline, one scikit-learn
+LinearRegression per (group, KPI) on a sample extrapolated to all of them.
+Run from the project root:
+
+    python -m benchmarks.forecasting [--groups 5000] [--kpis 24] [--years 15]
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.analysis.forecasting import TrendAccumulator, forecast_kpis, forecast_columns
+
+
+def make_frame(groups: int, kpis: int, years: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    year = np.tile(np.arange(2010, 2010 + years), groups)
+    data = {"year": year, "district": np.repeat([f"district-{g}" for g in range(groups)], years)}
+    trend = rng.normal(0, 10, (groups, kpis))
+    for k in range(kpis):
+        data[f"kpi_{k}"] = 1000 + np.repeat(trend[:, k], years) * (year - 2010) + rng.normal(0, 25, len(year))
+    return pd.DataFrame(data)
+
+
+def sklearn_baseline(frame: pd.DataFrame, kpis: list, sample_groups: int) -> float:
+    """Seconds per (group, KPI) fit with one LinearRegression each."""
+    from sklearn.linear_model import LinearRegression
+
+    groups = frame["district"].unique()[:sample_groups]
+    start = time.perf_counter()
+    fits = 0
+    for group in groups:
+        rows = frame[frame["district"] == group]
+        for kpi in kpis:
+            model = LinearRegression().fit(rows[["year"]], rows[kpi])
+            model.predict(pd.DataFrame({"year": [rows["year"].max() + 1]}))
+            fits += 1
+    return (time.perf_counter() - start) / fits
+
+
+def main(groups: int, kpis: int, years: int, horizon: int):
+    frame = make_frame(groups, kpis, years)
+    kpi_columns = [c for c in frame.columns if c.startswith("kpi_")]
+    print(f"{groups} groups x {kpis} KPIs x {years} years = {len(frame):,} rows, horizon={horizon}")
+
+    accumulator = TrendAccumulator(len(kpi_columns))
+    start = time.perf_counter()
+    accumulator.add(frame["district"].to_numpy(), frame["year"].to_numpy(dtype=np.float64),
+                    frame[kpi_columns].to_numpy(dtype=np.float64))
+    accumulator.fit(horizon, 0.95)
+    fit_seconds = time.perf_counter() - start
+    print(f"{'vectorized fit':>28}: {fit_seconds * 1000:8.1f} ms")
+
+    csv = frame.to_csv(index=False).encode()
+    start = time.perf_counter()
+    result = forecast_kpis(io.BytesIO(csv), group_by="district", horizon=horizon)
+    parse_seconds = time.perf_counter() - start
+    forecast_columns(result)
+    print(f"{'CSV parse + fit':>28}: {parse_seconds * 1000:8.1f} ms ({len(csv) / 1e6:.0f} MB)")
+    print(f"{'... + JSON-ready columns':>28}: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    # The KPI columns are guessed from a file object, which must still be readable for the full pass
+    expected = forecast_kpis(frame, group_by="district", horizon=horizon)
+    assert result["kpis"] == kpi_columns == expected["kpis"], result["kpis"]
+    assert np.allclose(result["predicted"], expected["predicted"])
+
+    per_fit = sklearn_baseline(frame, kpi_columns, sample_groups=20)
+    print(f"{'sklearn loop (extrapolated)':>28}: {per_fit * groups * kpis * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=5000)
+    parser.add_argument("--kpis", type=int, default=24)
+    parser.add_argument("--years", type=int, default=15)
+    parser.add_argument("--horizon", type=int, default=3)
+    args = parser.parse_args()
+    main(args.groups, args.kpis, args.years, args.horizon)
@@ -0,0 +1,57 @@
+"""
+Throughput benchmark for document ingestion.
+
+Embeds a synthetic multi-megabyte policy document with the real embedding
+model and upserts it into a fake index that simulates network latency.
+Run from the project root:
+
+    python -m benchmarks.ingestion
+"""
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from app.vectorstore import document_embedder
+from app.vectorstore.chunk_manifest import ChunkManifest, manifest_component
+from app.vectorstore.pinecone_client import index_component
+from benchmarks.fakes import FakeIndex
+
+UPSERT_LATENCY = 0.05
+
+
+def make_document(size_bytes: int) -> str:
+    paragraph = (
+        "Section {n}. Residents must separate recyclable materials from household waste "
+        "and place them in the designated blue containers before 7am on collection days. "
+        "Commercial properties are subject to the same rules and to periodic inspection.\n\n"
+    )
+    parts, total, n = [], 0, 0
+    while total < size_bytes:
+        text = paragraph.format(n=n)
+        parts.append(text)
+        total += len(text)
+        n += 1
+    return "".join(parts)
+
+
+async def main():
+    index_component.set(FakeIndex(UPSERT_LATENCY))
+    # A fresh manifest so nothing is skipped as already ingested
+    manifest_component.set(ChunkManifest(Path(tempfile.mkdtemp()) / "manifest.db"))
+    print(f"EMBED_BATCH_SIZE={document_embedder.EMBED_BATCH_SIZE}, "
+          f"UPSERT_BATCH_SIZE={document_embedder.UPSERT_BATCH_SIZE}, upsert latency={UPSERT_LATENCY * 1000:.0f}ms")
+    print(f"{'document':>10} {'upload':>8} {'chunks':>8} {'embedded':>9} {'seconds':>8} {'chunks/s':>9}")
+    for megabytes in (1, 5, 10):
+        document = make_document(megabytes * 1024 * 1024)
+        # The second upload of the same document should be close to free
+        for upload in ("first", "repeat"):
+            start = time.perf_counter()
+            stats = await document_embedder.process_and_embed_document(document, f"bench-{megabytes}mb")
+            elapsed = time.perf_counter() - start
+            print(f"{megabytes:>8}MB {upload:>8} {stats['chunks']:>8} {stats['embedded']:>9} "
+                  f"{elapsed:>8.1f} {stats['chunks'] / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
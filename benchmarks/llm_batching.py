@@ -0,0 +1,61 @@
+"""
+Throughput vs. tail latency benchmark for LLM micro-batching.
+
+Uses a local fake LLM whose batch call costs a fixed overhead plus a small
+amount per prompt, which is where batching pays off. Concurrent clients send
+prompts from both the chat and policy lanes, first without batching and then
+with several max-wait / max-batch settings. Run from the project root:
+
+    python -m benchmarks.llm_batching
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from app.services import llm_service
+from benchmarks.fakes import FakeChatModel
+
+CALL_OVERHEAD = 0.05
+PER_PROMPT = 0.002
+CLIENTS = 64
+REQUESTS_PER_CLIENT = 20
+SETTINGS = [(None, None), (2, 8), (5, 16), (10, 16), (20, 32)]
+
+
+async def run(max_wait_ms, max_batch) -> tuple:
+    llm_service.LLM_BATCH_ENABLED = max_wait_ms is not None
+    if max_wait_ms is not None:
+        llm_service.LLM_BATCH_MAX_WAIT_MS = max_wait_ms
+        llm_service.LLM_BATCH_MAX_SIZE = max_batch
+        llm_service._batcher = None
+
+    latencies = []
+
+    async def client(n):
+        lane = "chat" if n % 2 else "policy"
+        for i in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            await llm_service.ask_llm_async(f"{lane} {n}-{i}", use_cache=False, lane=lane)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return len(latencies) / elapsed, p50, p99
+
+
+async def main():
+    llm_service.llm_component.set(FakeChatModel(CALL_OVERHEAD, seconds_per_prompt=PER_PROMPT))
+    print(f"{CLIENTS} clients x {REQUESTS_PER_CLIENT} requests, LLM_MAX_CONCURRENCY={llm_service.LLM_MAX_CONCURRENCY}, "
+          f"call overhead={CALL_OVERHEAD * 1000:.0f}ms + {PER_PROMPT * 1000:.0f}ms/prompt")
+    print(f"{'max wait ms':>11} {'max batch':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for max_wait_ms, max_batch in SETTINGS:
+        throughput, p50, p99 = await run(max_wait_ms, max_batch)
+        label = "off" if max_wait_ms is None else str(max_wait_ms)
+        print(f"{label:>11} {max_batch or '-':>9} {throughput:>8.0f} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+"""
+Load benchmark for the async LLM path.
+
+Replaces the Gemini model with a local fake that answers after a fixed latency,
+then fires batches of requests through ask_llm_async at increasing levels of
+concurrency. Run from the project root:
+
+    python -m benchmarks.llm_load
+"""
+import asyncio
+import time
+
+from app.services import llm_service
+from benchmarks.fakes import FakeChatModel
+
+
+async def run_level(concurrency: int, total: int) -> float:
+    """Sends `total` prompts with `concurrency` in flight and returns requests/sec."""
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f"question {i}")
+
+    async def worker():
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            await llm_service.ask_llm_async(prompt, use_cache=False)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(latency: float = 0.05, total: int = 200):
+    llm_service.llm_component.set(FakeChatModel(latency))
+    print(f"fake latency={latency * 1000:.0f}ms, requests per level={total}, "
+          f"LLM_MAX_CONCURRENCY={llm_service.LLM_MAX_CONCURRENCY}")
+    print(f"{'concurrency':>12} {'req/s':>10}")
+    for concurrency in (1, 2, 4, 8, 16, 32):
+        throughput = await run_level(concurrency, total)
+        print(f"{concurrency:>12} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
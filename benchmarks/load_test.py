@@ -0,0 +1,357 @@
+"""
+End-to-end load test of every router, with local stand-ins for Gemini and Pinecone.
+
+Drives the FastAPI app in-process through realistic requests: chat (plain and
+RAG), policy summaries, document uploads, searches, forecasts, anomaly checks
+and feedback. Each endpoint is first loaded on its own, then all of them
+together in a weighted mix. The LLM is a deterministic fake with a fixed
+latency, embeddings come from a hashing fake, and vectors, datasets and
+feedback go to the local index and stores in a temporary directory. The
+request sequence is generated from a seed, so runs are repeatable.
+
+Reports throughput, p50/p95/p99 latency, errors and peak RSS (this process
+plus the analysis workers) per phase, and writes them as JSON. Passing a
+previous result with --compare flags regressions beyond --tolerance and
+exits with status 1, so it can gate CI. Run from the project root:
+
+    python -m benchmarks.load_test [--requests 200] [--concurrency 16] [--llm-latency 0.1]
+    python -m benchmarks.load_test --compare old.json [--tolerance 0.2]
+    python -m benchmarks.load_test --compare old.json --results new.json   # compare only
+"""
+import os
+import tempfile
+from pathlib import Path
+
+# Everything the app writes goes to a scratch directory. Set before the app is
+# imported, since its settings are read at import time; worker processes
+# inherit the environment (and must not create a directory of their own).
+if "LOAD_TEST_DIR" not in os.environ:
+    os.environ["LOAD_TEST_DIR"] = tempfile.mkdtemp(prefix="load-test-")
+WORKDIR = Path(os.environ["LOAD_TEST_DIR"])
+os.environ.update({
+    "DATASET_DIR": str(WORKDIR / "datasets"),
+    "VECTOR_BACKEND": "local",
+    "LOCAL_INDEX_PATH": str(WORKDIR / "index"),
+    "WARM_UP_ON_STARTUP": "false",
+})
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import numpy as np
+
+from app.main import app
+from app.services import executors, llm_service
+from app.services.feedback_store import FeedbackStore, feedback_store_component
+from app.vectorstore.chunk_manifest import ChunkManifest, manifest_component
+from app.vectorstore.document_embedder import model_component
+from app.vectorstore.pinecone_client import get_index
+from benchmarks.csv_stream import write_csv
+from benchmarks.fakes import VOCABULARY, FakeChatModel, FakeEmbeddingModel
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Share of each endpoint in the mixed phase
+MIX = {
+    "chat": 25,
+    "chat-rag": 10,
+    "summarize": 10,
+    "search": 20,
+    "upload": 5,
+    "forecast": 8,
+    "anomalies": 7,
+    "feedback": 15,
+}
+
+DISTRICTS = [f"district-{i}" for i in range(20)]
+TOPICS = ["recycling", "bus routes", "solar subsidies", "water tariffs", "street lighting",
+          "noise rules", "parking permits", "park opening hours", "zoning changes", "energy use"]
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    lines, line = [], []
+    for _ in range(words):
+        line.append(rng.choice(VOCABULARY))
+        if len(line) == 12:
+            lines.append(" ".join(line) + ".")
+            line = []
+            if rng.random() < 0.2:
+                lines.append("")
+    return "\n".join(lines + [" ".join(line)])
+
+
+def build_requests(endpoint: str, count: int, rng: random.Random, dataset_id: str) -> list:
+    """Returns `count` (endpoint, request kwargs) pairs. Questions repeat, as they do in practice."""
+    questions = [f"What are the {topic} rules in {district}?" for topic in TOPICS for district in DISTRICTS[:5]]
+    documents = [make_text(random.Random(i), 600) for i in range(20)]
+    requests = []
+    for i in range(count):
+        name = endpoint if endpoint != "mixed" else rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        if name == "chat":
+            kwargs = {"json": {"prompt": rng.choice(questions)}}
+        elif name == "chat-rag":
+            kwargs = {"json": {"prompt": rng.choice(questions), "use_rag": True}}
+        elif name == "summarize":
+            kwargs = {"json": {"text": rng.choice(documents)}}
+        elif name == "search":
+            kwargs = {"json": {"query": rng.choice(questions), "top_k": 5}}
+        elif name == "upload":
+            # Re-uploads of a few documents with small edits, so some chunks are new each time
+            text = documents[rng.randrange(5)] + "\n\n" + make_text(rng, 50)
+            kwargs = {"files": {"file": (f"policy-{rng.randrange(5)}.txt", text.encode(), "text/plain")}}
+        elif name == "forecast":
+            kwargs = {"params": {"dataset_id": dataset_id, "kpi_column": rng.choice(["energy", "water"])}}
+        elif name == "anomalies":
+            kwargs = {"params": {"dataset_id": dataset_id, "kpi_column": "energy", "method": rng.choice(["zscore", "ewma"]),
+                                 "group_by": "district", "window": 30, "limit": 100}}
+        else:
+            kwargs = {"json": {"name": f"user-{rng.randrange(1000)}", "category": rng.choice(TOPICS),
+                               "message": make_text(rng, 30)}}
+        requests.append((name, kwargs))
+    return requests
+
+
+ROUTES = {
+    "chat": "/chat/ask",
+    "chat-rag": "/chat/ask",
+    "summarize": "/policy/summarize-policy",
+    "search": "/vectors/search-documents",
+    "upload": "/vectors/upload-document",
+    "forecast": "/analysis/forecast",
+    "anomalies": "/analysis/anomalies",
+    "feedback": "/feedback/submit-feedback",
+}
+
+
+def rss_bytes() -> int:
+    """Resident memory of this process and the analysis worker processes."""
+    pool = executors.executors["analysis"]._pool
+    pids = [os.getpid()] + list(getattr(pool, "_processes", None) or {})
+    page = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page
+        except OSError:
+            if pid == os.getpid():
+                # No /proc (e.g. macOS): fall back to this process's peak so far
+                total += resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return total
+
+
+class PeakMemory:
+    """Samples rss_bytes() on a background thread and keeps the highest value."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def latency_stats(latencies: list, errors: int) -> dict:
+    values = np.array(latencies) * 1000
+    stats = {"requests": len(latencies), "errors": errors}
+    if len(values):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        stats.update(p50_ms=round(p50, 2), p95_ms=round(p95, 2), p99_ms=round(p99, 2), max_ms=round(values.max(), 2))
+    return stats
+
+
+async def run_phase(client: httpx.AsyncClient, requests: list, concurrency: int) -> dict:
+    """Sends the requests with `concurrency` in flight and returns throughput, latencies and peak RSS."""
+    latencies = {name: [] for name, _ in requests}
+    errors = {name: 0 for name, _ in requests}
+    error_samples = {}
+    pending = iter(requests)
+
+    async def worker():
+        for name, kwargs in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(ROUTES[name], **kwargs)
+                failed = response.status_code >= 400 or response.json().get("status") == "error"
+                detail = response.text[:200]
+            except Exception as e:
+                failed, detail = True, repr(e)
+            latencies[name].append(time.perf_counter() - start)
+            if failed:
+                errors[name] += 1
+                error_samples.setdefault(name, detail)
+
+    llm_service.clear_cache()
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(requests),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(requests) / elapsed, 2),
+        "peak_rss_mb": round(memory.peak / 2**20, 1),
+        "endpoints": {name: latency_stats(latencies[name], errors[name]) for name in latencies},
+        "error_samples": error_samples,
+    }
+
+
+async def seed_index(documents: int):
+    """Fills the index with chunks to search, without going through the upload endpoint."""
+    model = model_component.get()
+    texts = [make_text(random.Random(10_000 + i), 150) for i in range(documents)]
+    vectors = model.encode(texts).tolist()
+    get_index().upsert([
+        {"id": f"seed-{i}", "values": vector, "metadata": {"text": text, "document_id": f"seed-{i // 10}"}}
+        for i, (text, vector) in enumerate(zip(texts, vectors))
+    ])
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    llm_service.llm_component.set(FakeChatModel(args.llm_latency))
+    model_component.set(FakeEmbeddingModel(seconds_per_text=args.embed_latency))
+    manifest_component.set(ChunkManifest(WORKDIR / "manifest.db"))
+    feedback_store_component.set(FeedbackStore(WORKDIR / "feedback.db"))
+    await seed_index(args.seed_chunks)
+
+    csv_path = WORKDIR / "sensors.csv"
+    write_csv(csv_path, args.csv_mb)
+    rng = random.Random(args.seed)
+    phases = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+        with open(csv_path, "rb") as f:
+            response = await client.post("/analysis/datasets", files={"file": ("sensors.csv", f, "text/csv")})
+        response.raise_for_status()
+        dataset_id = response.json()["dataset_id"]
+
+        names = [name for name in MIX if name in args.endpoints] + (["mixed"] if "mixed" in args.endpoints else [])
+        for name in names:
+            count = args.mixed_requests if name == "mixed" else args.requests
+            phases[name] = await run_phase(client, build_requests(name, count, rng, dataset_id), args.concurrency)
+            print_phase(name, phases[name])
+    executors.shutdown_executors()
+
+    return {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("compare", "results", "output")},
+        "phases": phases,
+    }
+
+
+def print_phase(name: str, phase: dict):
+    print(f"\n{name}: {phase['throughput_rps']} req/s, peak RSS {phase['peak_rss_mb']} MB")
+    print(f"  {'endpoint':>10} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in phase["endpoints"].items():
+        print(f"  {endpoint:>10} {stats['requests']:>8} {stats['errors']:>6} {stats.get('p50_ms', float('nan')):>8.1f} "
+              f"{stats.get('p95_ms', float('nan')):>8.1f} {stats.get('p99_ms', float('nan')):>8.1f}")
+    for endpoint, detail in phase["error_samples"].items():
+        print(f"  first {endpoint} error: {detail}")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """
+    Prints how each phase changed against the baseline and returns the
+    regressions: throughput down, or p95/p99 latency, peak RSS or errors up,
+    by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    print(f"\nAgainst {baseline.get('version')} ({baseline.get('timestamp')}), tolerance {tolerance:.0%}:")
+    for name, phase in current["phases"].items():
+        old = baseline["phases"].get(name)
+        if old is None:
+            continue
+        checks = [("throughput_rps", phase["throughput_rps"], old["throughput_rps"], -1),
+                  ("peak_rss_mb", phase["peak_rss_mb"], old["peak_rss_mb"], 1)]
+        for endpoint, stats in phase["endpoints"].items():
+            before = old["endpoints"].get(endpoint, {})
+            for key in ("p95_ms", "p99_ms"):
+                if key in stats and key in before:
+                    checks.append((f"{endpoint} {key}", stats[key], before[key], 1))
+            if stats["errors"] > before.get("errors", 0):
+                regressions.append(f"{name}: {endpoint} errors {before.get('errors', 0)} -> {stats['errors']}")
+        for label, value, previous, direction in checks:
+            change = (value - previous) / previous if previous else 0.0
+            flag = change * direction > tolerance
+            print(f"  {name:>10} {label:<22} {previous:>10} -> {value:>10} ({change:+.1%}){'  REGRESSION' if flag else ''}")
+            if flag:
+                regressions.append(f"{name}: {label} {previous} -> {value} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="requests per single-endpoint phase")
+    parser.add_argument("--mixed-requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="seconds per fake LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per text embedded")
+    parser.add_argument("--csv-mb", type=int, default=10, help="size of the dataset used by forecast and anomalies")
+    parser.add_argument("--seed-chunks", type=int, default=5000, help="chunks in the index before the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endpoints", nargs="+", default=[*MIX, "mixed"], choices=[*MIX, "mixed"])
+    parser.add_argument("--output", type=Path, help="where to write the results (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="a previous results file to check for regressions")
+    parser.add_argument("--results", type=Path, help="with --compare: compare this file instead of running")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    try:
+        report(args)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+def report(args):
+    if args.results:
+        current = json.loads(args.results.read_text())
+    else:
+        current = asyncio.run(run(args))
+        output = args.output or RESULTS_DIR / f"load_test-{current['version'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        print(f"\nResults written to {output}")
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), current, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
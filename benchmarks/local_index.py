@@ -0,0 +1,76 @@
+"""
+Recall and latency benchmark for the local vector index.
+
+Fills a temporary LocalVectorIndex with 10k, 100k and 1M random unit vectors
+(clustered, like real embeddings), then compares its top-10 results against
+an exact float64 search and reports query latency. Vectors are generated and
+the exact top-10 is computed one batch at a time, so 1M chunks fit in a few GB. Run from the project root:
+
+    python -m benchmarks.local_index
+"""
+import tempfile
+import time
+
+import numpy as np
+
+from app.vectorstore.local_index import LocalVectorIndex
+
+DIMENSION = 384
+SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = 100
+TOP_K = 10
+UPSERT_BATCH = 10_000
+
+
+def make_vectors(rng, count: int, centers) -> np.ndarray:
+    labels = rng.integers(0, len(centers), count)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((count, DIMENSION), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def merge_top_k(best_ids, best_scores, ids, scores):
+    """Keeps the TOP_K highest scores per query row out of the current best and a new block."""
+    ids = np.concatenate([best_ids, ids], axis=1)
+    scores = np.concatenate([best_scores, scores], axis=1)
+    keep = np.argpartition(-scores, TOP_K - 1, axis=1)[:, :TOP_K]
+    return np.take_along_axis(ids, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((200, DIMENSION)).astype(np.float32)
+    print(f"{'chunks':>10} {'load s':>8} {f'recall@{TOP_K}':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in SIZES:
+        queries = make_vectors(rng, QUERIES, centers).astype(np.float64)
+        exact = np.zeros((QUERIES, 0), dtype=np.int64)
+        exact_scores = np.zeros((QUERIES, 0))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = LocalVectorIndex(tmp, dimension=DIMENSION)
+            load_seconds = 0.0
+            for offset in range(0, size, UPSERT_BATCH):
+                batch = make_vectors(rng, min(UPSERT_BATCH, size - offset), centers)
+                start = time.perf_counter()
+                index.upsert(vectors=[
+                    {"id": f"v{offset + i}", "values": values, "metadata": {"document_id": f"doc{(offset + i) % 50}"}}
+                    for i, values in enumerate(batch)
+                ])
+                load_seconds += time.perf_counter() - start
+                ids = np.broadcast_to(np.arange(offset, offset + len(batch)), (QUERIES, len(batch)))
+                exact, exact_scores = merge_top_k(exact, exact_scores, ids, queries @ batch.astype(np.float64).T)
+
+            latencies, hits = [], 0
+            for q, expected in zip(queries, exact):
+                start = time.perf_counter()
+                result = index.query(vector=q, top_k=TOP_K)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found = {int(match["id"][1:]) for match in result["matches"]}
+                hits += len(found & set(expected.tolist()))
+
+        recall = hits / (QUERIES * TOP_K)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{size:>10} {load_seconds:>8.1f} {recall:>10.3f} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Cold-start benchmark for the API.
+
+Imports app.main in fresh interpreters and reports how long that takes, which
+is what a new replica pays before it can serve requests. Models and clients
+are created lazily, so this should stay well under a second. Run from the
+project root:
+
+    python -m benchmarks.startup [--runs 5] [--max-seconds 1.0]
+
+Exits with status 1 when the median exceeds --max-seconds, so it can guard
+against regressions in CI.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def measure_once() -> tuple:
+    """Returns (seconds to import app.main, seconds for the whole interpreter run)."""
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1]), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    imports, totals = zip(*(measure_once() for _ in range(args.runs)))
+    median = statistics.median(imports)
+    print(f"import app.main: median {median:.3f}s, max {max(imports):.3f}s over {args.runs} runs")
+    print(f"interpreter total: median {statistics.median(totals):.3f}s")
+    if median > args.max_seconds:
+        print(f"FAIL: median import time is above {args.max_seconds}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,123 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+import httpx
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # The base URL of your running FastAPI backend
-API_BASE_URL = "http://127.0.0.1:8000"
+API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
+
+# The read timeout is the longest wait for the next bytes of a response, so it has
+# to allow for a slow LLM answer; connecting to the backend should be quick.
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "120"))
+# Searches, forecasts and anomaly checks don't wait on the LLM, so a click gives up much sooner
+API_ANALYSIS_READ_TIMEOUT = float(os.getenv("API_ANALYSIS_READ_TIMEOUT", "30"))
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_BACKOFF_SECONDS = float(os.getenv("API_BACKOFF_SECONDS", "0.5"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "16"))
+# How long identical searches, forecasts and anomaly checks are answered locally
+API_CACHE_TTL_SECONDS = int(os.getenv("API_CACHE_TTL_SECONDS", "300"))
+UPLOAD_BLOCK_SIZE = 256 * 1024
+
+TIMEOUT = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+# Responses worth retrying: the backend is restarting or shedding load
+RETRY_STATUSES = (502, 503, 504)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """
+    One pooled keep-alive session shared by every rerun and user session.
+    Streamlit reruns the script on each interaction, so without it every call
+    would open a new connection.
+    """
+    session = requests.Session()
+    # A failed connection attempt sent nothing, so it is safe to retry for any request
+    retry = Retry(total=API_RETRIES, connect=API_RETRIES, read=0, status=0, backoff_factor=API_BACKOFF_SECONDS)
+    adapter = HTTPAdapter(pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _request(method: str, path: str, idempotent: bool = False, **kwargs) -> requests.Response:
+    """
+    Sends a request through the shared session with the default timeouts.
+    Idempotent requests are also retried, with exponential backoff, when the
+    backend is overloaded (502/503/504). Only GETs are retried after a read
+    timeout: a slow POST is still being worked on, and a retry would just wait
+    for it again.
+    """
+    kwargs.setdefault("timeout", TIMEOUT)
+    attempts = API_RETRIES + 1 if idempotent else 1
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        try:
+            response = get_session().request(method, f"{API_BASE_URL}{path}", **kwargs)
+        except requests.exceptions.ReadTimeout:
+            if last or method != "GET": raise
+        else:
+            if response.status_code not in RETRY_STATUSES or last: return response
+            response.close()
+        time.sleep(API_BACKOFF_SECONDS * 2 ** attempt)
+
+
+class BackendError(Exception):
+    """An error response, raised inside cached calls so that failures are not cached."""
+
+    def __init__(self, response: requests.Response):
+        try: detail = response.json().get("detail")
+        except ValueError: detail = response.text
+        super().__init__(f"{response.status_code} - {detail}")
+
+
+@st.cache_data(ttl=API_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_json(method: str, path: str, params: dict = None, payload: dict = None):
+    # Streamlit keys the cache on a hash of the arguments
+    response = _request(
+        method, path, idempotent=True, params=params, json=payload,
+        timeout=(API_CONNECT_TIMEOUT, API_ANALYSIS_READ_TIMEOUT),
+    )
+    if response.status_code != 200: raise BackendError(response)
+    return response.json()
+
+
+def _multipart_body(fields, boundary: str):
+    """
+    Yields a multipart/form-data body piece by piece, reading each file in
+    blocks, so an upload is sent from its buffer instead of being copied first.
+    fields is a list of (field name, (file name, file object, content type)).
+    """
+    for name, (filename, fileobj, content_type) in fields:
+        filename = filename.replace('"', "%22")
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+               f'Content-Type: {content_type}\r\n\r\n').encode()
+        fileobj.seek(0)
+        while block := fileobj.read(UPLOAD_BLOCK_SIZE):
+            yield block
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+def _upload(path: str, fields) -> requests.Response:
+    boundary = uuid.uuid4().hex
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    return _request("POST", path, data=_multipart_body(fields, boundary), headers=headers)
+
 
 def get_summary_from_backend(text: str) -> str:
     """
     Sends text to the backend's summarize-policy endpoint and returns the summary.
     """
     try:
-        url = f"{API_BASE_URL}/policy/summarize-policy"
         payload = {"text": text}
-        response = requests.post(url, json=payload)
+        response = _request("POST", "/policy/summarize-policy", json=payload)
 
         if response.status_code == 200:
             return response.json().get("summary", "Could not parse summary.")
@@ -26,9 +132,8 @@ def submit_feedback_to_backend(name: str, category: str, message: str) -> bool:
     Sends feedback data to the backend and returns True on success.
     """
     try:
-        url = f"{API_BASE_URL}/feedback/submit-feedback"
         payload = {"name": name, "category": category, "message": message}
-        response = requests.post(url, json=payload)
+        response = _request("POST", "/feedback/submit-feedback", json=payload)
 
         if response.status_code == 200 and response.json().get("status") == "success": return True
         else: st.error(f"Error submitting feedback: {response.status_code} - {response.text}"); return False
@@ -37,64 +142,174 @@ def submit_feedback_to_backend(name: str, category: str, message: str) -> bool:
 def upload_document_to_backend(uploaded_file):
     """Sends a .txt file to the backend for embedding and returns the response."""
     try:
-        url = f"{API_BASE_URL}/vectors/upload-document"
-        # Prepare the file for the POST request
-        files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-        response = requests.post(url, files=files)
-        
+        fields = [('file', (uploaded_file.name, uploaded_file, uploaded_file.type or "text/plain"))]
+        response = _upload("/vectors/upload-document", fields)
+
         if response.status_code == 200:
             st.success(response.json().get("message", "File processed successfully.")); return True
         else: st.error(f"Error uploading file: {response.status_code} - {response.json().get('detail')}"); return False
     except requests.exceptions.RequestException as e: st.error(f"Could not connect to the backend API: {e}"); return False
 
+def start_bulk_upload_to_backend(uploaded_files):
+    """Sends several .txt/.zip files for background ingestion and returns the job ID."""
+    try:
+        fields = [('files', (f.name, f, f.type or "application/octet-stream")) for f in uploaded_files]
+        response = _upload("/vectors/bulk-upload", fields)
+
+        if response.status_code == 200: return response.json().get("job_id")
+        else: st.error(f"Error uploading files: {response.status_code} - {response.json().get('detail')}"); return None
+    except requests.exceptions.RequestException as e: st.error(f"Could not connect to the backend API: {e}"); return None
+
+def get_ingestion_job_from_backend(job_id: str):
+    """Returns the progress of a background ingestion job."""
+    try:
+        response = _request("GET", f"/vectors/jobs/{job_id}", idempotent=True)
+
+        if response.status_code == 200: return response.json()
+        else: st.error(f"Error fetching job status: {response.status_code} - {response.json().get('detail')}"); return None
+    except requests.exceptions.RequestException as e: st.error(f"Could not connect to the backend API: {e}"); return None
+
 def search_documents_in_backend(query: str):
-    """Sends a search query to the backend and returns the results."""
+    """Sends a search query to the backend and returns the results; repeated queries are cached."""
     try:
-        url = f"{API_BASE_URL}/vectors/search-documents"
-        payload = {"query": query}
-        response = requests.post(url, json=payload)
-        
-        if response.status_code == 200: return response.json().get("results", [])
-        else: st.error(f"Error during search: {response.status_code} - {response.json().get('detail')}"); return []
+        return _cached_json("POST", "/vectors/search-documents", payload={"query": query}).get("results", [])
+    except BackendError as e: st.error(f"Error during search: {e}"); return []
     except requests.exceptions.RequestException as e: st.error(f"Could not connect to the backend API: {e}"); return []
 
 def get_chat_response_from_backend(prompt: str):
     """Sends a prompt to the chat endpoint and gets a response."""
     try:
-        url = f"{API_BASE_URL}/chat/ask"
         payload = {"prompt": prompt}
-        response = requests.post(url, json=payload)
-        
+        response = _request("POST", "/chat/ask", json=payload)
+
         if response.status_code == 200 and response.json().get("status") == "success":
             return response.json().get("response")
         else: st.error(f"Error from chat API: {response.status_code} - {response.text}"); return "Sorry, I encountered an error."
     except requests.exceptions.RequestException as e: st.error(f"Could not connect to the backend API: {e}"); return "Sorry, I couldn't connect to the backend."
 
+def _stream_tokens(path: str, payload: dict, error_text: str):
+    """
+    Posts to a Server-Sent Events endpoint and yields text tokens as they arrive.
+    Meant to be passed straight to st.write_stream.
+    """
+    try:
+        with _request("POST", path, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                st.error(f"Error from API: {response.status_code} - {response.text}"); yield error_text; return
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "): continue
+                event = json.loads(line[len("data: "):])
+                if event.get("done"): return
+                yield event.get("token", "")
+    except requests.exceptions.RequestException as e: st.error(f"Could not connect to the backend API: {e}"); yield error_text
+
+def stream_chat_response_from_backend(prompt: str):
+    """Streams the chat response token by token."""
+    return _stream_tokens("/chat/ask-stream", {"prompt": prompt}, "Sorry, I couldn't get a response from the backend.")
+
+def stream_summary_from_backend(text: str):
+    """Streams the policy summary token by token."""
+    return _stream_tokens("/policy/summarize-policy-stream", {"text": text}, "Sorry, I couldn't get a summary from the backend.")
+
 # --- ADD THESE TWO NEW FUNCTIONS ---
-def get_forecast_from_backend(uploaded_file, kpi_column):
+def upload_dataset_to_backend(uploaded_file):
+    """Stores a CSV on the backend once and returns its dataset info (ID, columns and preview rows)."""
     try:
-        url = f"{API_BASE_URL}/analysis/forecast?kpi_column={kpi_column}"
-        files = {'file': (uploaded_file.name, uploaded_file.getvalue(), 'text/csv')}
-        response = requests.post(url, files=files)
+        response = _upload("/analysis/datasets", [('file', (uploaded_file.name, uploaded_file, 'text/csv'))])
         if response.status_code == 200:
             return response.json()
         else:
-            st.error(f"Error forecasting: {response.status_code} - {response.json().get('detail')}")
+            st.error(f"Error uploading dataset: {response.status_code} - {response.json().get('detail')}")
             return None
     except requests.exceptions.RequestException as e:
         st.error(f"Could not connect to the backend API: {e}")
         return None
 
-def get_anomalies_from_backend(uploaded_file, kpi_column, threshold):
+def get_forecast_from_backend(dataset_id, kpi_column):
     try:
-        url = f"{API_BASE_URL}/analysis/anomalies?kpi_column={kpi_column}&threshold={threshold}"
-        files = {'file': (uploaded_file.name, uploaded_file.getvalue(), 'text/csv')}
-        response = requests.post(url, files=files)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Error finding anomalies: {response.status_code} - {response.json().get('detail')}")
-            return None
+        # A dataset ID always names the same data, so repeated forecasts come from the cache
+        params = {"kpi_column": kpi_column, "dataset_id": dataset_id}
+        return _cached_json("POST", "/analysis/forecast", params=params)
+    except BackendError as e:
+        st.error(f"Error forecasting: {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Could not connect to the backend API: {e}")
+        return None
+
+def get_anomalies_from_backend(dataset_id, kpi_column, threshold=None, method="threshold", window=30, group_by=None):
+    try:
+        params = {"kpi_column": kpi_column, "dataset_id": dataset_id, "method": method, "window": window}
+        if threshold is not None:
+            params["threshold"] = threshold
+        if group_by:
+            params["group_by"] = group_by
+        return _cached_json("POST", "/analysis/anomalies", params=params)
+    except BackendError as e:
+        st.error(f"Error finding anomalies: {e}")
+        return None
     except requests.exceptions.RequestException as e:
         st.error(f"Could not connect to the backend API: {e}")
         return None
+
+
+class AsyncApiClient:
+    """
+    An async client for making several backend calls at once, with the same
+    timeouts and retry policy as the functions above:
+
+        async with AsyncApiClient() as client:
+            results = await asyncio.gather(*(client.search(q) for q in queries))
+
+    From Streamlit code, run the coroutine with run_async().
+    """
+
+    def __init__(self, base_url: str = API_BASE_URL):
+        timeout = httpx.Timeout(API_READ_TIMEOUT, connect=API_CONNECT_TIMEOUT)
+        limits = httpx.Limits(max_connections=API_POOL_SIZE, max_keepalive_connections=API_POOL_SIZE)
+        # The transport retries failed connection attempts
+        transport = httpx.AsyncHTTPTransport(retries=API_RETRIES, limits=limits)
+        self._client = httpx.AsyncClient(base_url=base_url, timeout=timeout, transport=transport)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+
+    async def request(self, method: str, path: str, idempotent: bool = False, **kwargs) -> httpx.Response:
+        attempts = API_RETRIES + 1 if idempotent else 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except httpx.ReadTimeout:
+                if last or method != "GET": raise
+            else:
+                if response.status_code not in RETRY_STATUSES or last: return response
+            await asyncio.sleep(API_BACKOFF_SECONDS * 2 ** attempt)
+
+    async def _post_json(self, path: str, payload: dict = None, params: dict = None, idempotent: bool = False):
+        response = await self.request("POST", path, idempotent=idempotent, json=payload, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def ask(self, prompt: str) -> str:
+        return (await self._post_json("/chat/ask", {"prompt": prompt})).get("response")
+
+    async def search(self, query: str, top_k: int = 3) -> list:
+        result = await self._post_json("/vectors/search-documents", {"query": query, "top_k": top_k}, idempotent=True)
+        return result.get("results", [])
+
+    async def forecast(self, dataset_id: str, kpi_column: str) -> dict:
+        params = {"kpi_column": kpi_column, "dataset_id": dataset_id}
+        return await self._post_json("/analysis/forecast", params=params, idempotent=True)
+
+    async def anomalies(self, dataset_id: str, kpi_column: str, **options) -> dict:
+        params = {"kpi_column": kpi_column, "dataset_id": dataset_id, **options}
+        return await self._post_json("/analysis/anomalies", params=params, idempotent="stream_id" not in options)
+
+
+def run_async(coroutine):
+    """Runs a coroutine to completion from synchronous (Streamlit) code."""
+    return asyncio.run(coroutine)
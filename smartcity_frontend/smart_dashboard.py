@@ -1,3 +1,4 @@
+import time
 import streamlit as st
 import pandas as pd
 from api_client import * # Import all functions
@@ -28,15 +29,23 @@ with st.sidebar:
 
 st.title("Sustainable Smart City Assistant")
 
+def dataset_for(uploaded_file):
+    """Uploads a CSV to the backend once per file and remembers its dataset info across reruns."""
+    datasets = st.session_state.setdefault("datasets", {})
+    if uploaded_file.file_id not in datasets:
+        with st.spinner("Uploading..."):
+            info = upload_dataset_to_backend(uploaded_file)
+        if not info: return None
+        datasets[uploaded_file.file_id] = info
+    return datasets[uploaded_file.file_id]
+
 # --- Page Content (The logic is the same, but the page names are updated) ---
 if selected_page == "Summarizer":
     st.header("Policy Summarizer")
     policy_text = st.text_area("Paste policy text:", height=200, label_visibility="collapsed")
     if st.button("Generate Summary"):
         if policy_text:
-            with st.spinner("Summarizing..."):
-                summary = get_summary_from_backend(policy_text)
-                if summary: st.write(summary)
+            st.write_stream(stream_summary_from_backend(policy_text))
         else: st.warning("Please paste some policy text.")
 
 elif selected_page == "Feedback":
@@ -53,11 +62,27 @@ elif selected_page == "Feedback":
 
 elif selected_page == "Documents":
     st.header("Upload & Search Documents")
-    uploaded_file = st.file_uploader("Upload a .txt policy document", type="txt")
-    if uploaded_file:
+    uploaded_files = st.file_uploader("Upload .txt policy documents or .zip archives", type=["txt", "zip"], accept_multiple_files=True)
+    if uploaded_files:
         if st.button("Process and Upload"):
-            with st.spinner("Processing..."):
-                upload_document_to_backend(uploaded_file)
+            job_id = start_bulk_upload_to_backend(uploaded_files)
+            if job_id: st.session_state.ingestion_job = job_id
+    if job_id := st.session_state.get("ingestion_job"):
+        # Poll the background job instead of blocking on the upload
+        status_box = st.empty()
+        while True:
+            job = get_ingestion_job_from_backend(job_id)
+            if not job: break
+            with status_box.container():
+                done = job["files_done"] + job["files_failed"]
+                st.progress(done / job["files_total"], text=f"{done}/{job['files_total']} files, {job['chunks']} chunks ({job['status']})")
+                for f in job["files"]:
+                    if f["status"] == "failed": st.error(f"{f['name']}: {f['error']}")
+            if job["status"] in ("completed", "failed"):
+                if job["files_done"]: st.success(f"Processed {job['files_done']} files into {job['chunks']} vectors.")
+                del st.session_state.ingestion_job
+                break
+            time.sleep(1)
     st.divider()
     st.header("Search Documents")
     search_query = st.text_input("Enter search query")
@@ -82,20 +107,19 @@ elif selected_page == "Chat":
     if prompt := st.chat_input("Ask a question..."):
         st.session_state.messages.append({"role": "user", "content": prompt})
         st.chat_message("user").write(prompt)
-        with st.spinner("Thinking..."):
-            response = get_chat_response_from_backend(prompt)
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.chat_message("assistant").write(response)
+        # Tokens are rendered as they arrive instead of waiting for the full answer
+        response = st.chat_message("assistant").write_stream(stream_chat_response_from_backend(prompt))
+        st.session_state.messages.append({"role": "assistant", "content": response})
 
 elif selected_page == "Forecasting":
     st.header("📈 Key Performance Indicator Forecasting")
     uploaded_csv = st.file_uploader("Choose a CSV file with a 'year' column", type="csv")
-    if uploaded_csv is not None:
+    if uploaded_csv is not None and (dataset := dataset_for(uploaded_csv)):
         kpi_column = st.text_input("Enter the name of the column to forecast (e.g., 'energy')")
         if st.button("Forecast Next Year"):
             if kpi_column:
                 with st.spinner("Calculating forecast..."):
-                    result = get_forecast_from_backend(uploaded_csv, kpi_column)
+                    result = get_forecast_from_backend(dataset["dataset_id"], kpi_column)
                     if result:
                         st.success(f"Forecast for '{result['kpi']}' in {result['predicted_year']}: **{result['predicted_value']}**")
             else: st.warning("Please enter the column name.")
@@ -103,18 +127,26 @@ elif selected_page == "Forecasting":
 elif selected_page == "Anomalies":
     st.header("⚠️ Anomaly Detection")
     uploaded_csv = st.file_uploader("Choose a CSV file to check for anomalies", type="csv")
-    if uploaded_csv is not None:
-        df = pd.read_csv(uploaded_csv)
+    if uploaded_csv is not None and (dataset := dataset_for(uploaded_csv)):
+        # The preview and column list come from the backend, so the file is parsed once, there
+        columns = list(dataset["columns"])
         st.write("Data Preview:")
-        st.dataframe(df.head())
-        kpi_column = st.selectbox("Select the column to check", df.columns)
-        threshold = st.number_input("Set the threshold value", value=1000.0)
+        st.dataframe(pd.DataFrame(dataset["preview"], columns=columns))
+        kpi_column = st.selectbox("Select the column to check", columns)
+        method = st.selectbox("Detection method", ["threshold", "zscore", "iqr", "ewma"])
+        threshold, window = None, 30
+        if method == "threshold":
+            threshold = st.number_input("Set the threshold value", value=1000.0)
+        else:
+            window = st.number_input("Window (rows)", min_value=2, value=30)
+        group_by = st.selectbox("Check separately per (optional)", [None] + [c for c in columns if c != kpi_column])
         if st.button("Check for Anomalies"):
-            uploaded_csv.seek(0)
             with st.spinner("Checking..."):
-                result = get_anomalies_from_backend(uploaded_csv, kpi_column, threshold)
+                result = get_anomalies_from_backend(dataset["dataset_id"], kpi_column, threshold, method, window, group_by)
                 if result:
                     st.success(f"Found **{result['anomaly_count']}** anomalies.")
+                    if result['truncated']:
+                        st.caption(f"Showing the {len(result['anomalies'])} most severe.")
                     if result['anomalies']:
                         st.write("Anomalous Records:")
                         st.dataframe(pd.DataFrame(result['anomalies']))
\ No newline at end of file